@@ -0,0 +1,17 @@
+# backend/admin.py
+
+import os
+import secrets
+from fastapi import HTTPException, Request
+
+# Operator endpoints under /admin exist only when ADMIN_TOKEN is set, and require it
+# in the X-Admin-Token header
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+# FastAPI dependency guarding admin routes
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required.")
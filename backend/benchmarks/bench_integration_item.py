@@ -0,0 +1,75 @@
+# backend/benchmarks/bench_integration_item.py
+#
+# Micro-benchmark for IntegrationItem: memory per item and to_clean_dict throughput,
+# compared with the previous __dict__-based implementation.
+#
+#   cd backend && python -m benchmarks.bench_integration_item [--items 100000]
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from integrations.integration_item import FIELDS, IntegrationItem, to_clean_dicts
+
+
+class LegacyIntegrationItem:
+    # The pre-__slots__ implementation, kept here as the baseline
+    def __init__(self, **kwargs):
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.directory = False
+        self.visibility = True
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def to_clean_dict(self):
+        result = self.__dict__.copy()
+        result = {k: v for k, v in result.items() if v is not None}
+        if result.get("directory") is False:
+            result.pop("directory")
+        if result.get("visibility") is True:
+            result.pop("visibility")
+        return result
+
+
+def _item_kwargs(i):
+    return {
+        "id": str(i),
+        "type": "HubSpot_Contact",
+        "name": f"Contact {i}",
+        "creation_time": "2025-01-01T00:00:00Z",
+        "email": f"contact{i}@example.com",
+        "phone_number": "+1 555 0100",
+        "company_name": "Example Inc",
+    }
+
+
+def _measure(cls, count, serialize):
+    kwargs = [_item_kwargs(i) for i in range(count)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [cls(**kw) for kw in kwargs]
+    bytes_per_item = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    serialize(items)
+    elapsed = time.perf_counter() - start
+    return {"bytes_per_item": round(bytes_per_item, 1), "items_per_sec": round(count / elapsed)}
+
+
+def run(count):
+    return {
+        "items": count,
+        "legacy": _measure(LegacyIntegrationItem, count, lambda items: [i.to_clean_dict() for i in items]),
+        "slotted": _measure(IntegrationItem, count, to_clean_dicts),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.items), indent=2))
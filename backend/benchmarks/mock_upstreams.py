@@ -0,0 +1,164 @@
+# backend/benchmarks/mock_upstreams.py
+#
+# In-process stand-ins for the upstream APIs the integrations call: the Airtable meta
+# API, Notion search, HubSpot contacts, and each provider's OAuth token endpoint.
+# They are served as one ASGI app through httpx.ASGITransport, so the integration
+# code runs unchanged against them through the provider clients in http_client.
+#
+# Latency, page count, page size, padding per item and a share of 429 responses
+# are configurable. Page bodies are encoded once up front, so the mocks cost little
+# CPU next to the code under test (they do share its event loop).
+
+import asyncio
+import json
+import random
+from typing import NamedTuple
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+class UpstreamConfig(NamedTuple):
+    latency_ms: float = 50  # per upstream request
+    pages: int = 5  # pages per listing
+    page_size: int = 100
+    item_bytes: int = 0  # extra text per item, to grow payloads
+    rate_429: float = 0.0  # share of listing requests answered with 429
+    retry_after: float = 0  # Retry-After sent with injected 429s
+
+
+def _json(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _padding(config, i):
+    return ("x" * config.item_bytes) if config.item_bytes else f"row {i}"
+
+
+def _airtable_bases(config, page):
+    start = page * config.page_size
+    body = {"bases": [{"id": f"app{i}", "name": f"Base {i}", "permissionLevel": "create"} for i in range(start, start + config.page_size)]}
+    if page + 1 < config.pages:
+        body["offset"] = f"p{page + 1}"
+    return _json(body)
+
+
+def _airtable_tables(config):
+    return _json(
+        {
+            "tables": [
+                {
+                    "id": f"tbl{t}",
+                    "name": f"Table {t}",
+                    "description": _padding(config, t),
+                    "fields": [{"id": f"fld{f}", "name": f"Field {f}", "type": "singleLineText"} for f in range(10)],
+                }
+                for t in range(3)
+            ]
+        }
+    )
+
+
+def _notion_search(config, page):
+    start = page * config.page_size
+    results = [
+        {
+            "object": "page",
+            "id": f"page-{i}",
+            "created_time": "2025-01-01T00:00:00.000Z",
+            "last_edited_time": "2025-01-02T00:00:00.000Z",
+            "properties": {
+                "Name": {"type": "title", "title": [{"plain_text": f"Company {i}"}]},
+                "Email": {"type": "email", "email": f"company{i}@example.com"},
+                "Contact Number": {"type": "phone_number", "phone_number": "+1 555 0100"},
+                "City/Country": {"type": "rich_text", "rich_text": [{"plain_text": _padding(config, i)}]},
+            },
+        }
+        for i in range(start, start + config.page_size)
+    ]
+    has_more = page + 1 < config.pages
+    return _json({"results": results, "has_more": has_more, "next_cursor": str(page + 1) if has_more else None})
+
+
+def _hubspot_contacts(config, page):
+    start = page * config.page_size
+    body = {
+        "results": [
+            {
+                "id": str(i),
+                "properties": {
+                    "firstname": f"First{i}",
+                    "lastname": f"Last{i}",
+                    "email": f"contact{i}@example.com",
+                    "company": _padding(config, i),
+                    "createdAt": "2025-01-01T00:00:00.000Z",
+                },
+            }
+            for i in range(start, start + config.page_size)
+        ]
+    }
+    if page + 1 < config.pages:
+        body["paging"] = {"next": {"after": str(page + 1)}}
+    return _json(body)
+
+
+_TOKEN = _json(
+    {"access_token": "mock-access", "refresh_token": "mock-refresh", "expires_in": 3600, "token_type": "bearer"}
+)
+
+
+# Build the mock ASGI app. `stats` counts requests per route and injected 429s.
+def create_upstream_app(config: UpstreamConfig, stats: dict) -> Starlette:
+    bases = [_airtable_bases(config, p) for p in range(config.pages)]
+    tables = _airtable_tables(config)
+    search = [_notion_search(config, p) for p in range(config.pages)]
+    contacts = [_hubspot_contacts(config, p) for p in range(config.pages)]
+
+    async def respond(name, body, throttle=True):
+        stats[name] = stats.get(name, 0) + 1
+        await asyncio.sleep(config.latency_ms / 1000)
+        if throttle and config.rate_429 and random.random() < config.rate_429:
+            stats["injected_429"] = stats.get("injected_429", 0) + 1
+            return Response(status_code=429, headers={"Retry-After": str(config.retry_after)})
+        return Response(body, media_type="application/json")
+
+    async def airtable_bases(request: Request):
+        offset = request.query_params.get("offset")
+        return await respond("airtable_bases", bases[int(offset[1:]) if offset else 0])
+
+    async def airtable_tables(request: Request):
+        return await respond("airtable_tables", tables)
+
+    async def notion_search(request: Request):
+        body = json.loads(await request.body() or b"{}")
+        return await respond("notion_search", search[int(body.get("start_cursor") or 0)])
+
+    async def hubspot_contacts(request: Request):
+        return await respond("hubspot_contacts", contacts[int(request.query_params.get("after", 0))])
+
+    async def token(request: Request):
+        return await respond("oauth_token", _TOKEN, throttle=False)
+
+    return Starlette(
+        routes=[
+            Route("/v0/meta/bases", airtable_bases),
+            Route("/v0/meta/bases/{base_id}/tables", airtable_tables),
+            Route("/v1/search", notion_search, methods=["POST"]),
+            Route("/crm/v3/objects/contacts", hubspot_contacts),
+            # Airtable, Notion and HubSpot token endpoints
+            Route("/oauth2/v1/token", token, methods=["POST"]),
+            Route("/v1/oauth/token", token, methods=["POST"]),
+            Route("/oauth/v1/token", token, methods=["POST"]),
+        ]
+    )
+
+
+# One client per provider, all routed to the mock app whatever host they address
+def create_upstream_clients(app) -> dict[str, httpx.AsyncClient]:
+    return {
+        provider: httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        for provider in ("airtable", "notion", "hubspot")
+    }
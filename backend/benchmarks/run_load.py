@@ -0,0 +1,237 @@
+# backend/benchmarks/run_load.py
+#
+# Load test for the /load routes and OAuth callbacks against the mock upstreams in
+# benchmarks/mock_upstreams.py. The app runs in-process (lifespan included) behind
+# httpx.ASGITransport; Redis is either an in-memory server (fakeredis, with lupa for
+# the Lua scripts: pip install "fakeredis[lua]") or a local Redis from the usual
+# REDIS_HOST/REDIS_PORT settings.
+#
+# Scenarios, per provider:
+#   cold   - every load uses a new token, so each one crawls the mock upstream
+#   warm   - every load uses one token, so all but the first are cache hits
+#   oauth  - authorize + oauth2callback round trips (token exchange included)
+#
+# Prints a JSON report (also written to --output) with throughput, p50/p95/p99
+# latency, event-loop lag and peak RSS for comparing runs.
+#
+#   cd backend && python -m benchmarks.run_load --requests 200 --concurrency 20
+#   cd backend && python -m benchmarks.run_load --provider notion --latency-ms 100 --rate-429 0.05
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+import http_client
+import rate_limit
+import redis_client
+from benchmarks.mock_upstreams import UpstreamConfig, create_upstream_app, create_upstream_clients
+from integrations import airtable, hubspot, notion
+
+PROVIDERS = ("airtable", "notion", "hubspot")
+SCENARIOS = ("cold", "warm", "oauth")
+LAG_INTERVAL = 0.01
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+    }
+
+
+# Sample how late a short sleep wakes up; anything beyond the interval is time the
+# loop spent running something else
+class LoopLagMonitor:
+    def __init__(self):
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.samples.append((loop.time() - started - LAG_INTERVAL) * 1000)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return _percentiles(self.samples)
+
+
+def _use_memory_redis():
+    try:
+        import fakeredis
+        import fakeredis.aioredis
+        import lupa  # noqa: F401 - fakeredis needs it for EVAL (locks, rate limiter)
+    except ImportError:
+        sys.exit('--redis memory needs: pip install "fakeredis[lua]"')
+    pool = redis_client.redis.ConnectionPool(
+        connection_class=fakeredis.aioredis.FakeConnection, server=fakeredis.FakeServer()
+    )
+    redis_client.redis_client = redis_client._TimedRedis(connection_pool=pool)
+
+
+def _lift_rate_limits():
+    # The real per-provider limits would make the limiter the only thing measured
+    unlimited = rate_limit.RateLimit(rate=1e6, burst=1_000_000)
+    airtable.BASE_RATE_LIMIT = airtable.TOKEN_RATE_LIMIT = unlimited
+    notion.RATE_LIMIT = hubspot.RATE_LIMIT = unlimited
+
+
+async def _drive(concurrency, total, request_once):
+    latencies = []
+    statuses = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                status = await request_once(index)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "statuses": statuses,
+        "latency_ms": _percentiles(latencies),
+    }
+
+
+def _load_request(client, provider, token_for):
+    async def request_once(index):
+        credentials = json.dumps({"access_token": token_for(index)})
+        response = await client.post(f"/integrations/{provider}/load", data={"credentials": credentials})
+        await response.aread()
+        return response.status_code
+
+    return request_once
+
+
+def _oauth_request(client, provider, run_id):
+    async def request_once(index):
+        form = {"user_id": f"user-{run_id}-{index}", "org_id": "bench"}
+        response = await client.post(f"/integrations/{provider}/authorize", data=form)
+        state = parse_qs(urlsplit(response.json()).query)["state"][0]
+        response = await client.get(
+            f"/integrations/{provider}/oauth2callback", params={"code": "bench", "state": state}
+        )
+        return response.status_code
+
+    return request_once
+
+
+async def run(args):
+    from main import app, lifespan
+
+    if args.redis == "memory":
+        _use_memory_redis()
+    if not args.respect_rate_limits:
+        _lift_rate_limits()
+
+    config = UpstreamConfig(
+        latency_ms=args.latency_ms,
+        pages=args.pages,
+        page_size=args.page_size,
+        item_bytes=args.item_bytes,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+    )
+    upstream_stats = {}
+    # Registered before startup, so the lifespan keeps them instead of opening real ones
+    http_client._clients.update(create_upstream_clients(create_upstream_app(config, upstream_stats)))
+
+    providers = PROVIDERS if args.provider == "all" else (args.provider,)
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    run_id = int(time.time())
+    results = {}
+
+    lag = LoopLagMonitor()
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            lag.start()
+            for provider in providers:
+                for scenario in scenarios:
+                    if scenario == "oauth":
+                        request_once = _oauth_request(client, provider, run_id)
+                    elif scenario == "cold":
+                        request_once = _load_request(client, provider, lambda i: f"cold-{run_id}-{i}")
+                    else:
+                        request_once = _load_request(client, provider, lambda i: f"warm-{run_id}")
+                    results[f"{provider}.{scenario}"] = await _drive(
+                        args.concurrency, args.requests, request_once
+                    )
+            loop_lag = await lag.stop()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if platform.system() == "Darwin" else 1024)
+    return {
+        "config": {**config._asdict(), **{k: v for k, v in vars(args).items() if k != "output"}},
+        "python": platform.python_version(),
+        "results": results,
+        "loop_lag_ms": loop_lag,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "upstream_requests": upstream_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app against mock upstreams")
+    parser.add_argument("--provider", choices=("all", *PROVIDERS), default="all")
+    parser.add_argument("--scenario", choices=("all", *SCENARIOS), default="all")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--item-bytes", type=int, default=0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0)
+    parser.add_argument("--redis", choices=("memory", "local"), default="memory")
+    parser.add_argument("--respect-rate-limits", action="store_true")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    print(encoded)
+
+
+if __name__ == "__main__":
+    main()
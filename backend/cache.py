@@ -0,0 +1,284 @@
+# backend/cache.py
+
+import os
+import time
+import asyncio
+import secrets
+from collections import OrderedDict
+from fastapi import HTTPException
+import redis_client
+from redis_client import (
+    acquire_lock_redis, add_key_value_redis, extend_lock_redis, get_value_redis,
+    get_value_with_ttl_redis, publish_redis, release_lock_redis
+)
+from serializer import dumps, loads
+from metrics import observe_items, span
+from logger import logger
+
+# Cross-worker fetch lock: its TTL (renewed every third of it while the leader is still
+# fetching, so a dead leader frees it quickly), and how long followers wait for the result
+SINGLE_FLIGHT_LOCK_TTL = float(os.environ.get("SINGLE_FLIGHT_LOCK_TTL", 60))
+SINGLE_FLIGHT_WAIT = float(os.environ.get("SINGLE_FLIGHT_WAIT", 600))
+SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+
+# In-process tier in front of Redis for item lists
+LOCAL_CACHE_MAX_BYTES = int(os.environ.get("LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+LOCAL_CACHE_TTL = float(os.environ.get("LOCAL_CACHE_TTL", 30))
+
+# Workers tell each other to drop local copies when a key is rewritten
+INVALIDATION_CHANNEL = "items_cache_invalidate"
+WORKER_ID = secrets.token_hex(4)
+
+# Raised to followers whose leader is still crawling at the wait deadline; the loaders
+# let it through as a 503 rather than turning it into a 500
+class FetchInProgress(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Items are still being fetched, try again shortly.")
+
+
+# Hit/miss counters per tier
+cache_stats = {
+    "local_hits": 0,
+    "local_misses": 0,
+    "redis_hits": 0,
+    "redis_misses": 0,
+}
+
+
+# LRU + TTL cache of bytes values, bounded by total value size.
+# Entries may also carry a soft deadline after which they are reported as stale.
+class LocalLRUCache:
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[bytes, float, float]] = OrderedDict()
+
+    def get(self, key):
+        return self.get_entry(key)[0]
+
+    # Returns (value, stale), or (None, False) if missing or expired
+    def get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        value, expires_at, stale_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self.pop(key)
+            return None, False
+        self._entries.move_to_end(key)
+        return value, stale_at <= now
+
+    def set(self, key, value: bytes, ttl=None, stale_after=None):
+        self.pop(key)
+        if len(value) > self.max_bytes:
+            return
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        stale_at = now + stale_after if stale_after is not None else float("inf")
+        self._entries[key] = (value, now + ttl, stale_at)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalLRUCache(LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_TTL)
+
+
+def get_cache_stats():
+    stats = dict(cache_stats)
+    stats["local_entries"] = len(local_cache)
+    stats["local_bytes"] = local_cache.size
+    return stats
+
+
+# Read an item list from the local tier, falling back to Redis. Returns (value, stale).
+# Redis keys live for the hard TTL (expire); an entry is stale once it is older than
+# soft_ttl, which is derived from the remaining TTL. Local copies never outlive Redis.
+async def get_items_entry(redis_key, expire=300, soft_ttl=None):
+    value, stale = local_cache.get_entry(redis_key)
+    if value is not None:
+        cache_stats["local_hits"] += 1
+        return value, stale
+    cache_stats["local_misses"] += 1
+
+    value, ttl = await get_value_with_ttl_redis(redis_key)
+    if not value:
+        cache_stats["redis_misses"] += 1
+        return None, False
+    cache_stats["redis_hits"] += 1
+
+    stale_after = None
+    if soft_ttl is not None and ttl is not None:
+        stale_after = max(ttl - (expire - soft_ttl), 0)
+    local_cache.set(redis_key, value, ttl, stale_after)
+    return value, stale_after == 0
+
+
+# Write an item list to both tiers and tell other workers to drop their copy
+async def store_items(redis_key, encoded: bytes, expire=300, soft_ttl=None):
+    await add_key_value_redis(redis_key, encoded, expire=expire)
+    local_cache.set(redis_key, encoded, expire, soft_ttl)
+    await publish_redis(INVALIDATION_CHANNEL, dumps({"origin": WORKER_ID, "key": redis_key}))
+
+
+async def _listen_for_invalidations():
+    while True:
+        pubsub = redis_client.redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages may have been missed while disconnected
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                payload = loads(message["data"])
+                if payload.get("origin") != WORKER_ID:
+                    local_cache.pop(payload.get("key"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("[Cache] Invalidation listener failed, retrying in 5s")
+            await asyncio.sleep(5)
+        finally:
+            await pubsub.aclose()
+
+
+_listener_task: asyncio.Task | None = None
+
+
+# Start/stop the pub/sub invalidation listener (called from the app lifespan)
+def start_invalidation_listener():
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_invalidation_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+
+
+# In-flight fetches in this process, keyed by cache key
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _forget_inflight(key, task):
+    _inflight.pop(key, None)
+    # Mark the outcome as observed if every waiter went away
+    if not task.cancelled():
+        task.exception()
+
+
+def _start_flight(key, fn):
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget_inflight(key, t))
+    else:
+        logger.debug("[Cache] Joining in-flight fetch for %s", key)
+    return task
+
+
+# Run fn once per key in this process; concurrent callers share the same result.
+# The fetch runs as its own task, so a cancelled caller does not cancel it for others.
+async def single_flight(key, fn):
+    return await asyncio.shield(_start_flight(key, fn))
+
+
+# Wait for another worker's leader to populate the key. Returns None if its lock goes
+# away without a result; answers 503 if the lock is still held at the deadline.
+async def _wait_for_leader(redis_key, lock_key, deadline):
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        cached = await get_value_redis(redis_key)
+        if cached:
+            return cached
+        if not await get_value_redis(lock_key):
+            return None
+    raise FetchInProgress()
+
+
+# Keep the fetch lock alive for as long as the leader is crawling
+async def _renew_lock(lock_key, lock_token):
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_LOCK_TTL / 3)
+        if not await extend_lock_redis(lock_key, lock_token, int(SINGLE_FLIGHT_LOCK_TTL * 1000)):
+            logger.warning(f"[Cache] Lost fetch lock {lock_key}")
+            return
+
+
+async def _fetch_and_store(redis_key, fetch, provider, expire, soft_ttl=None, background=False):
+    lock_key = f"{redis_key}:lock"
+    lock_token = await acquire_lock_redis(lock_key, int(SINGLE_FLIGHT_LOCK_TTL * 1000))
+    if lock_token is None:
+        if background:
+            logger.debug("[%s] Another worker is already refreshing %s", provider, redis_key)
+            return None
+        logger.info(f"[{provider}] Waiting for another worker to fetch items")
+        deadline = asyncio.get_running_loop().time() + SINGLE_FLIGHT_WAIT
+        while lock_token is None:
+            cached = await _wait_for_leader(redis_key, lock_key, deadline)
+            if cached:
+                return cached
+            # The leader gave up without a result; one of the followers takes over
+            logger.warning(f"[{provider}] Leader did not populate the cache, retrying the lock")
+            lock_token = await acquire_lock_redis(lock_key, int(SINGLE_FLIGHT_LOCK_TTL * 1000))
+
+    renewal = asyncio.create_task(_renew_lock(lock_key, lock_token))
+    try:
+        with span("fetch", provider=provider):
+            items = await fetch()
+        observe_items(provider.lower(), len(items))
+        encoded = dumps(items)
+        await store_items(redis_key, encoded, expire=expire, soft_ttl=soft_ttl)
+        logger.info(f"[{provider}] Retrieved and cached {len(items)} items")
+        return encoded
+    finally:
+        renewal.cancel()
+        await release_lock_redis(lock_key, lock_token)
+
+
+# Return the encoded item list for redis_key, fetching it at most once across
+# concurrent requests (in-process and across workers) on a cache miss.
+# With soft_ttl set, entries older than soft_ttl but younger than expire (the hard TTL)
+# are returned immediately while a deduplicated background refresh replaces them.
+async def get_cached_items(redis_key, fetch, provider, expire=300, soft_ttl=None) -> bytes:
+    cached, stale = await get_items_entry(redis_key, expire, soft_ttl)
+    if cached:
+        if stale:
+            logger.info(f"[{provider}] Serving stale items, refreshing in background")
+            # Own flight key: a background refresh may return None (another worker is
+            # refreshing), which a foreground miss must never join and receive
+            _start_flight(
+                f"{redis_key}:refresh",
+                lambda: _fetch_and_store(redis_key, fetch, provider, expire, soft_ttl, background=True),
+            )
+        else:
+            logger.info(f"[{provider}] Retrieving cached items")
+        return cached
+    return await single_flight(
+        redis_key, lambda: _fetch_and_store(redis_key, fetch, provider, expire, soft_ttl)
+    )
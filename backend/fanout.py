@@ -0,0 +1,94 @@
+# backend/fanout.py
+
+import os
+import time
+import asyncio
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from integrations.airtable import get_items_airtable
+from integrations.notion import get_items_notion
+from integrations.hubspot import get_items_hubspot
+from serializer import RawJSONResponse, dumps
+from streaming import NDJSON_MEDIA_TYPE
+from logger import logger
+
+LOADERS = {
+    "airtable": get_items_airtable,
+    "notion": get_items_notion,
+    "hubspot": get_items_hubspot,
+}
+
+# Per-provider budget for one combined load; a provider that runs over is reported as
+# timed out while the others still return (its fetch keeps filling the cache)
+LOAD_TIMEOUTS = {
+    provider: float(os.environ.get(f"{provider.upper()}_LOAD_TIMEOUT", 30))
+    for provider in LOADERS
+}
+
+
+# Load one provider's items and return its result object as encoded JSON. Failures
+# are reported in the result instead of raised, so one provider can't fail the rest.
+async def _load_provider(provider, credentials) -> bytes:
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            LOADERS[provider](credentials, raw=True), LOAD_TIMEOUTS[provider]
+        )
+        elapsed = round(time.perf_counter() - started, 3)
+        # Splice the cached bytes in rather than decoding and re-encoding the items
+        return (
+            b'{"provider":' + dumps(provider)
+            + b',"status":"ok","seconds":' + dumps(elapsed)
+            + b',"items":' + response.body + b"}"
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"[Load] {provider} timed out after {LOAD_TIMEOUTS[provider]}s")
+        error, status_code = f"Timed out after {LOAD_TIMEOUTS[provider]}s", 504
+    except HTTPException as e:
+        error, status_code = e.detail, e.status_code
+    except Exception:
+        logger.exception(f"[Load] Unexpected error loading {provider}")
+        error, status_code = f"{provider} data fetch failed.", 500
+    return dumps(
+        {
+            "provider": provider,
+            "status": "error",
+            "seconds": round(time.perf_counter() - started, 3),
+            "status_code": status_code,
+            "error": error,
+        }
+    )
+
+
+def _start_loads(credentials_by_provider: dict):
+    return [
+        asyncio.ensure_future(_load_provider(provider, credentials))
+        for provider, credentials in credentials_by_provider.items()
+    ]
+
+
+# Load every requested provider concurrently; the response takes as long as the
+# slowest one. Body: {"results": [<result per provider, in request order>]}
+async def load_all(credentials_by_provider: dict) -> RawJSONResponse:
+    logger.info(f"[Load] Loading {', '.join(credentials_by_provider)}")
+    results = await asyncio.gather(*_start_loads(credentials_by_provider))
+    return RawJSONResponse(b'{"results":[' + b",".join(results) + b"]}")
+
+
+# NDJSON variant: one result line per provider as soon as it finishes
+async def _result_lines(credentials_by_provider: dict):
+    tasks = _start_loads(credentials_by_provider)
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished + b"\n"
+    finally:
+        # Client went away: stop waiting on the remaining providers
+        for task in tasks:
+            task.cancel()
+
+
+def stream_all(credentials_by_provider: dict) -> StreamingResponse:
+    logger.info(f"[Load] Streaming {', '.join(credentials_by_provider)}")
+    return StreamingResponse(
+        _result_lines(credentials_by_provider), media_type=NDJSON_MEDIA_TYPE
+    )
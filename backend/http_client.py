@@ -0,0 +1,71 @@
+# backend/http_client.py
+
+import os
+import importlib.util
+import httpx
+from logger import logger
+
+# Connection pool tuning shared by every provider client
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "false").lower() == "true"
+
+# Per-provider request timeouts (seconds)
+PROVIDER_TIMEOUTS = {
+    "airtable": float(os.environ.get("AIRTABLE_HTTP_TIMEOUT", 15)),
+    "notion": float(os.environ.get("NOTION_HTTP_TIMEOUT", 15)),
+    "hubspot": float(os.environ.get("HUBSPOT_HTTP_TIMEOUT", 15)),
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available():
+    # HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+    if not HTTP2_ENABLED:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("[HTTP] HTTP2_ENABLED is set but 'h2' is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+def _create_client(provider):
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(PROVIDER_TIMEOUTS.get(provider, 15)),
+        http2=_http2_available(),
+    )
+
+
+# Open one pooled client per provider (called from the app lifespan)
+async def init_http_clients():
+    for provider in PROVIDER_TIMEOUTS:
+        if provider not in _clients:
+            _clients[provider] = _create_client(provider)
+    logger.info(f"[HTTP] Opened pooled clients for {', '.join(_clients)}")
+
+
+# Get the shared client for a provider, creating it lazily outside the lifespan
+def get_http_client(provider) -> httpx.AsyncClient:
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _clients[provider] = _create_client(provider)
+    return client
+
+
+# Close every pooled client (called on app shutdown)
+async def close_http_clients():
+    clients = list(_clients.items())
+    _clients.clear()
+    for provider, client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            logger.exception(f"[HTTP] Failed to close client for '{provider}'")
+    logger.info("[HTTP] Closed pooled clients")
@@ -1,7 +1,6 @@
 # backend/integrations/airtable.py
 import os
 import datetime
-import json
 import secrets
 import base64
 import hashlib
@@ -9,10 +8,19 @@ import asyncio
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
 import httpx
-import requests
 from dotenv import load_dotenv
 from integrations.integration_item import IntegrationItem
-from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+from http_client import get_http_client
+from offload import run_transform
+from pagination import paginate
+from rate_limit import RETRY_STATUS_CODES, RateLimit, limit_scope, send_with_retry
+from redis_client import add_key_value_redis, mpop_redis, mset_redis, pop_value_redis
+from cache import FetchInProgress, get_cached_items
+from serializer import RawJSONResponse, dumps, loads
+from streaming import stream_cached_pages
+from warmup import schedule_warmup
+from metrics import observe_load
+from token_store import as_token, current_token, register_refresher, save_token
 from logger import logger
 
 load_dotenv()
@@ -29,6 +37,26 @@ authorization_url = (
 encoded_client_id_secret = base64.b64encode(
     f"{CLIENT_ID}:{CLIENT_SECRET}".encode()
 ).decode()
+BASES_URL = "https://api.airtable.com/v0/meta/bases"
+# Ceiling on base-list pages per crawl (Airtable returns up to 1000 bases per page)
+MAX_BASE_PAGES = int(os.getenv("AIRTABLE_MAX_BASE_PAGES", 100))
+# Max number of concurrent per-base table-schema requests
+MAX_CONCURRENT_REQUESTS = int(os.getenv("AIRTABLE_MAX_CONCURRENT_REQUESTS", 8))
+# Airtable allows 5 requests/s per base and 50 requests/s per access token
+BASE_RATE_LIMIT = RateLimit(
+    rate=float(os.getenv("AIRTABLE_BASE_RATE_LIMIT", 5)),
+    burst=int(os.getenv("AIRTABLE_BASE_RATE_BURST", 5)),
+)
+TOKEN_RATE_LIMIT = RateLimit(
+    rate=float(os.getenv("AIRTABLE_TOKEN_RATE_LIMIT", 50)),
+    burst=int(os.getenv("AIRTABLE_TOKEN_RATE_BURST", 50)),
+)
+
+# Item cache: fresh until the soft TTL, then served stale while refreshing in the
+# background until the hard TTL, after which loads block on upstream again
+ITEMS_CACHE_SOFT_TTL = int(os.getenv("AIRTABLE_ITEMS_CACHE_SOFT_TTL", 300))
+ITEMS_CACHE_HARD_TTL = int(os.getenv("AIRTABLE_ITEMS_CACHE_HARD_TTL", 900))
+
 scope = "data.records:read data.records:write data.recordComments:read data.recordComments:write schema.bases:read schema.bases:write"
 
 
@@ -41,7 +69,7 @@ async def authorize_airtable(user_id, org_id):
         "user_id": user_id,
         "org_id": org_id,
     }
-    encoded_state = base64.urlsafe_b64encode(json.dumps(state_data).encode()).decode()
+    encoded_state = base64.urlsafe_b64encode(dumps(state_data)).decode()
 
     code_verifier = secrets.token_urlsafe(32)
     m = hashlib.sha256()
@@ -50,17 +78,14 @@ async def authorize_airtable(user_id, org_id):
 
     auth_url = f"{authorization_url}&state={encoded_state}&code_challenge={code_challenge}&code_challenge_method=S256&scope={scope}"
 
-    await asyncio.gather(
-        add_key_value_redis(
-            f"airtable_state:{org_id}:{user_id}", json.dumps(state_data), expire=600
-        ),
-        add_key_value_redis(
-            f"airtable_verifier:{org_id}:{user_id}", code_verifier, expire=600
-        ),
-    )
-    logger.debug(
-        f"[Airtable] Saved state and code_verifier in Redis for user='{user_id}'"
+    await mset_redis(
+        {
+            f"airtable_state:{org_id}:{user_id}": dumps(state_data),
+            f"airtable_verifier:{org_id}:{user_id}": code_verifier,
+        },
+        expire=600,
     )
+    logger.debug("[Airtable] Saved state and code_verifier in Redis for user='%s'", user_id)
     return auth_url
 
 
@@ -77,18 +102,19 @@ async def oauth2callback_airtable(request: Request):
     try:
         code = request.query_params.get("code")
         encoded_state = request.query_params.get("state")
-        state_data = json.loads(base64.urlsafe_b64decode(encoded_state).decode())
+        state_data = loads(base64.urlsafe_b64decode(encoded_state))
 
         user_id = state_data.get("user_id")
         org_id = state_data.get("org_id")
         original_state = state_data.get("state")
 
-        saved_state, code_verifier = await asyncio.gather(
-            get_value_redis(f"airtable_state:{org_id}:{user_id}"),
-            get_value_redis(f"airtable_verifier:{org_id}:{user_id}"),
+        # State and verifier are single-use: read and delete them in one round trip
+        saved_state, code_verifier = await mpop_redis(
+            f"airtable_state:{org_id}:{user_id}",
+            f"airtable_verifier:{org_id}:{user_id}",
         )
 
-        if not saved_state or original_state != json.loads(saved_state).get("state"):
+        if not saved_state or original_state != loads(saved_state).get("state"):
             logger.warning(f"[Airtable] OAuth2 state mismatch for user='{user_id}'")
             raise HTTPException(status_code=400, detail="State does not match.")
 
@@ -96,33 +122,39 @@ async def oauth2callback_airtable(request: Request):
             f"[Airtable] State validated, requesting token for user='{user_id}'"
         )
 
-        async with httpx.AsyncClient() as client:
-            response, _, _ = await asyncio.gather(
-                client.post(
-                    "https://airtable.com/oauth2/v1/token",
-                    data={
-                        "grant_type": "authorization_code",
-                        "code": code,
-                        "redirect_uri": REDIRECT_URI,
-                        "client_id": CLIENT_ID,
-                        "code_verifier": code_verifier.decode(),
-                    },
-                    headers={
-                        "Authorization": f"Basic {encoded_client_id_secret}",
-                        "Content-Type": "application/x-www-form-urlencoded",
-                    },
-                ),
-                delete_key_redis(f"airtable_state:{org_id}:{user_id}"),
-                delete_key_redis(f"airtable_verifier:{org_id}:{user_id}"),
-            )
+        client = get_http_client("airtable")
+        response = await client.post(
+            "https://airtable.com/oauth2/v1/token",
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": REDIRECT_URI,
+                "client_id": CLIENT_ID,
+                "code_verifier": code_verifier.decode(),
+            },
+            headers={
+                "Authorization": f"Basic {encoded_client_id_secret}",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+        )
 
         await add_key_value_redis(
             f"airtable_credentials:{org_id}:{user_id}",
-            json.dumps(response.json()),
+            response.content,
             expire=600,
         )
         logger.info(f"[Airtable] Token exchange successful for user='{user_id}'")
 
+        # Keep the token set for refresh-aware loads and start filling the item
+        # cache so the first load doesn't crawl cold
+        if response.status_code == 200:
+            token = await save_token("airtable", org_id, user_id, response.content)
+            schedule_warmup(
+                "Airtable",
+                f"airtable:{org_id}:{user_id}",
+                lambda: get_items_airtable(token, raw=True),
+            )
+
         return HTMLResponse(content="<html><script>window.close();</script></html>")
 
     except Exception:
@@ -134,13 +166,38 @@ async def get_airtable_credentials(user_id, org_id):
     logger.info(
         f"[Airtable] Retrieving credentials for user='{user_id}', org='{org_id}'"
     )
-    credentials = await get_value_redis(f"airtable_credentials:{org_id}:{user_id}")
+    # Credentials are handed out once: GETDEL reads and removes them atomically
+    credentials = await pop_value_redis(f"airtable_credentials:{org_id}:{user_id}")
     if not credentials:
         logger.warning(f"[Airtable] No credentials found for user='{user_id}'")
         raise HTTPException(status_code=400, detail="No credentials found.")
-    await delete_key_redis(f"airtable_credentials:{org_id}:{user_id}")
-    logger.debug(f"[Airtable] Deleted credentials from Redis for user='{user_id}'")
-    return json.loads(credentials)
+    logger.debug("[Airtable] Deleted credentials from Redis for user='%s'", user_id)
+    return loads(credentials)
+
+
+# Exchange a refresh token for a new token set. Airtable rotates refresh tokens, so
+# the response replaces the stored one.
+async def refresh_airtable_token(refresh_token) -> bytes:
+    client = get_http_client("airtable")
+    response = await client.post(
+        "https://airtable.com/oauth2/v1/token",
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": CLIENT_ID,
+        },
+        headers={
+            "Authorization": f"Basic {encoded_client_id_secret}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+    )
+    if response.status_code != 200:
+        logger.error(f"[Airtable] Token refresh failed: {response.status_code} - {response.text}")
+        raise HTTPException(status_code=401, detail="Airtable token refresh failed.")
+    return response.content
+
+
+register_refresher("airtable", refresh_airtable_token)
 
 
 def create_integration_item_metadata_object(
@@ -156,71 +213,145 @@ def create_integration_item_metadata_object(
     )
 
 
-def fetch_items(access_token, url, aggregated_response: list, offset=None):
-    params = {"offset": offset} if offset else {}
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers, params=params)
+def parse_bases(content: bytes):
+    payload = loads(content)
+    return payload.get("bases", []), payload.get("offset")
 
-    if response.status_code == 200:
-        results = response.json().get("bases", [])
-        offset = response.json().get("offset")
 
-        aggregated_response.extend(results)
+# List every base the token can see, following the offset cursor
+async def fetch_bases(client: httpx.AsyncClient, access_token) -> list:
+    headers = {"Authorization": f"Bearer {access_token}"}
+    scope = limit_scope(access_token)
 
-        if offset:
-            fetch_items(access_token, url, aggregated_response, offset)
-    else:
+    async def fetch(offset):
+        response = await send_with_retry(
+            client, "GET", BASES_URL,
+            provider="airtable", scope=scope, limit=TOKEN_RATE_LIMIT,
+            headers=headers, params={"offset": offset} if offset else {},
+        )
+        if response.status_code != 200:
+            # Don't let a truncated base list be cached as the full result
+            logger.error(
+                f"[Airtable] Failed to fetch bases: {response.status_code} - {response.text}"
+            )
+            raise HTTPException(
+                status_code=response.status_code, detail="Failed to fetch Airtable bases"
+            )
+        return response.content
+
+    async def parse(content):
+        return parse_bases(content)
+
+    bases = []
+    async for page in paginate(fetch, parse, provider="Airtable", max_pages=MAX_BASE_PAGES):
+        bases.extend(page.data)
+    return bases
+
+
+# Table schemas for one base. Each request passes both the base's and the token's
+# rate limit. Throttling or server errors that outlast the retries raise, so a partial
+# crawl is never cached; other failures (e.g. access to the base removed) skip it.
+async def fetch_base_tables(
+    client: httpx.AsyncClient, access_token, base, semaphore: asyncio.Semaphore
+) -> list:
+    async with semaphore:
+        response = await send_with_retry(
+            client, "GET", f'https://api.airtable.com/v0/meta/bases/{base["id"]}/tables',
+            provider="airtable", scope=base["id"], limit=BASE_RATE_LIMIT,
+            extra_limits=((limit_scope(access_token), TOKEN_RATE_LIMIT),),
+            endpoint="/v0/meta/bases/{base_id}/tables",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    if response.status_code != 200:
         logger.error(
-            f"[Airtable] Failed to fetch bases: {response.status_code} - {response.text}"
+            f"[Airtable] Failed to fetch tables for base {base['id']}: {response.text}"
         )
+        if response.status_code in RETRY_STATUS_CODES:
+            raise HTTPException(
+                status_code=response.status_code, detail="Failed to fetch Airtable tables"
+            )
+        return []
+    # Schemas of large bases carry every field definition, so parse them off-loop
+    return await run_transform(parse_tables, response.content)
 
 
-async def get_items_airtable(credentials) -> list[dict]:
-    logger.info("[Airtable] Fetching integration items")
-    try:
-        credentials = json.loads(credentials)
-        access_token = credentials.get("access_token")
+def parse_tables(content: bytes) -> list:
+    return loads(content).get("tables", [])
 
-        token_hash = hashlib.sha256(access_token.encode()).hexdigest()
-        redis_key = f"airtable_items_cache:{token_hash}"
 
-        # Check Redis cache
-        cached = await get_value_redis(redis_key)
-        if cached:
-            logger.info("[Airtable] Retrieving cached item from redis")
-            return json.loads(cached)
+# Yield one page per base: the base item followed by its tables, in base order
+async def iter_airtable_pages(access_token):
+    client = get_http_client("airtable")
+    bases = await fetch_bases(client, access_token)
 
-        url = "https://api.airtable.com/v0/meta/bases"
-        responses = []
-        items = []
+    # Fan out table-schema requests up front, then consume them in base order
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = [
+        asyncio.ensure_future(fetch_base_tables(client, access_token, base, semaphore))
+        for base in bases
+    ]
+    try:
+        for base, task in zip(bases, tasks):
+            tables = await task
+            page = [create_integration_item_metadata_object(base, "Base").to_clean_dict()]
+            for table in tables:
+                page.append(
+                    create_integration_item_metadata_object(
+                        table, "Table", base.get("id"), base.get("name")
+                    ).to_clean_dict()
+                )
+            yield page
+    finally:
+        for task in tasks:
+            task.cancel()
 
-        fetch_items(access_token, url, responses)
 
-        for base in responses:
-            items.append(
-                create_integration_item_metadata_object(base, "Base").to_clean_dict()
-            )
-            tables_response = requests.get(
-                f'https://api.airtable.com/v0/meta/bases/{base["id"]}/tables',
-                headers={"Authorization": f"Bearer {access_token}"},
-            )
-            if tables_response.status_code == 200:
-                for table in tables_response.json().get("tables", []):
-                    items.append(
-                        create_integration_item_metadata_object(
-                            table, "Table", base.get("id"), base.get("name")
-                        ).to_clean_dict()
-                    )
-            else:
-                logger.error(
-                    f"[Airtable] Failed to fetch tables for base {base['id']}: {tables_response.text}"
-                )
+async def collect_items_airtable(access_token) -> list[dict]:
+    items = []
+    async for page in iter_airtable_pages(access_token):
+        items.extend(page)
+    return items
 
-        await add_key_value_redis(redis_key, json.dumps(items), expire=300)
-        logger.info(f"[Airtable] Retrieved and cached {len(items)} items")
 
-        return items
+async def get_items_airtable(credentials, raw=False):
+    logger.info("[Airtable] Fetching integration items")
+    try:
+        # Keyed by the posted token, which stays the same across refreshes
+        token = as_token(credentials)
+        redis_key = f"airtable_items_cache:{token.token_hash}"
+        access_token = (await current_token("airtable", token)).access_token
+
+        # Cached, or fetched once across concurrent requests; raw callers get the bytes as-is
+        encoded = await get_cached_items(
+            redis_key,
+            lambda: collect_items_airtable(access_token),
+            "Airtable",
+            expire=ITEMS_CACHE_HARD_TTL,
+            soft_ttl=ITEMS_CACHE_SOFT_TTL,
+        )
+        observe_load("airtable", len(encoded))
+        return RawJSONResponse(encoded) if raw else loads(encoded)
 
+    except FetchInProgress:
+        observe_load("airtable", outcome="error")
+        raise
     except Exception:
         logger.exception("[Airtable] Unexpected error while fetching items")
+        observe_load("airtable", outcome="error")
         raise HTTPException(status_code=500, detail="Airtable data fetch failed.")
+
+
+# Streaming variant of get_items_airtable for NDJSON responses
+async def stream_items_airtable(credentials):
+    logger.info("[Airtable] Streaming integration items")
+    token = as_token(credentials)
+    redis_key = f"airtable_items_cache:{token.token_hash}"
+    access_token = (await current_token("airtable", token)).access_token
+    pages = stream_cached_pages(
+        redis_key,
+        iter_airtable_pages(access_token),
+        expire=ITEMS_CACHE_HARD_TTL,
+        soft_ttl=ITEMS_CACHE_SOFT_TTL,
+    )
+    async for page in pages:
+        yield page
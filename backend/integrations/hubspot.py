@@ -1,15 +1,22 @@
 import os
-import json
 import secrets
 import asyncio
-import hashlib
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
-import httpx
 from dotenv import load_dotenv
 from urllib.parse import unquote
-from integrations.integration_item import IntegrationItem
-from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+from integrations.integration_item import IntegrationItem, to_clean_dicts
+from http_client import get_http_client
+from offload import run_transform
+from pagination import paginate
+from rate_limit import RateLimit, limit_scope, send_with_retry
+from redis_client import add_key_value_redis, pop_value_redis
+from cache import FetchInProgress, get_cached_items
+from serializer import RawJSONResponse, dumps, loads
+from streaming import stream_cached_pages
+from warmup import schedule_warmup
+from metrics import observe_load
+from token_store import as_token, current_token, register_refresher, save_token
 from logger import logger
 
 load_dotenv()
@@ -18,6 +25,22 @@ CLIENT_ID = os.getenv("HUBSPOT_CLIENT_ID")
 CLIENT_SECRET = os.getenv("HUBSPOT_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("HUBSPOT_REDIRECT_URI")
 SCOPES = os.getenv("HUBSPOT_SCOPES")
+# Contact pagination: HubSpot caps page size at 100; bound the crawl per load
+CONTACTS_URL = "https://api.hubapi.com/crm/v3/objects/contacts"
+CONTACT_PROPERTIES = "firstname,lastname,email,phone,company,jobtitle,hs_lead_status,createdAt"
+PAGE_SIZE = 100
+MAX_PAGES = int(os.getenv("HUBSPOT_MAX_PAGES", 2000))
+MAX_ITEMS = int(os.getenv("HUBSPOT_MAX_ITEMS", 200000))
+# HubSpot allows OAuth apps 110 requests per 10 seconds per account
+RATE_LIMIT = RateLimit(
+    rate=float(os.getenv("HUBSPOT_RATE_LIMIT", 10)),
+    burst=int(os.getenv("HUBSPOT_RATE_BURST", 100)),
+)
+
+# Item cache soft/hard TTLs (stale-while-revalidate, see cache.get_cached_items)
+ITEMS_CACHE_SOFT_TTL = int(os.getenv("HUBSPOT_ITEMS_CACHE_SOFT_TTL", 300))
+ITEMS_CACHE_HARD_TTL = int(os.getenv("HUBSPOT_ITEMS_CACHE_HARD_TTL", 900))
+
 AUTH_URL = f'https://app.hubspot.com/oauth/authorize?client_id={CLIENT_ID}&redirect_uri={REDIRECT_URI}&scope={SCOPES.replace(" ", "%20")}'
 
 
@@ -30,11 +53,11 @@ async def authorize_hubspot(user_id, org_id):
         "user_id": user_id,
         "org_id": org_id,
     }
-    encoded_state = json.dumps(state_data)
+    encoded_state = dumps(state_data).decode()
     await add_key_value_redis(
         f"hubspot_state:{org_id}:{user_id}", encoded_state, expire=600
     )
-    logger.debug(f"[HubSpot] Saved state in Redis for user='{user_id}'")
+    logger.debug("[HubSpot] Saved state in Redis for user='%s'", user_id)
 
     return f"{AUTH_URL}&state={encoded_state}"
 
@@ -53,7 +76,7 @@ async def oauth2callback_hubspot(request: Request):
         encoded_state = request.query_params.get("state")
         
         # Log the encoded state to check if it's correct
-        logger.debug(f"[HubSpot] Encoded state: {encoded_state}")
+        logger.debug("[HubSpot] Encoded state: %s", encoded_state)
 
         # URL-decode the state parameter before parsing
         decoded_state = unquote(encoded_state)
@@ -62,49 +85,53 @@ async def oauth2callback_hubspot(request: Request):
         decoded_state = decoded_state.replace('+', ' ')
         
         # Log the decoded state to check if it's properly decoded
-        logger.debug(f"[HubSpot] Decoded state: {decoded_state}")
+        logger.debug("[HubSpot] Decoded state: %s", decoded_state)
 
-        state_data = json.loads(decoded_state)
+        state_data = loads(decoded_state)
 
         original_state = state_data.get("state")
         user_id = state_data.get("user_id")
         org_id = state_data.get("org_id")
 
-        # Validate the state against what was saved in Redis
-        saved_state = await get_value_redis(f"hubspot_state:{org_id}:{user_id}")
-        if not saved_state or original_state != json.loads(saved_state).get("state"):
+        # Validate the state against what was saved in Redis (and consume it)
+        saved_state = await pop_value_redis(f"hubspot_state:{org_id}:{user_id}")
+        if not saved_state or original_state != loads(saved_state).get("state"):
             logger.warning(f"[HubSpot] OAuth2 state mismatch for user='{user_id}', org='{org_id}'")
             raise HTTPException(status_code=400, detail="State validation failed.")
 
         logger.info(f"[HubSpot] State validated for user='{user_id}', requesting token")
 
         # Fetch the token now
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.hubapi.com/oauth/v1/token",
-                data={
-                    "grant_type": "authorization_code",
-                    "client_id": CLIENT_ID,
-                    "client_secret": CLIENT_SECRET,
-                    "redirect_uri": REDIRECT_URI,
-                    "code": code,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
+        client = get_http_client("hubspot")
+        response = await client.post(
+            "https://api.hubapi.com/oauth/v1/token",
+            data={
+                "grant_type": "authorization_code",
+                "client_id": CLIENT_ID,
+                "client_secret": CLIENT_SECRET,
+                "redirect_uri": REDIRECT_URI,
+                "code": code,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
 
         if response.status_code != 200:
             logger.error(f"[HubSpot] Token exchange failed: {response.status_code} - {response.text}")
             raise HTTPException(status_code=response.status_code, detail="Failed to exchange authorization code.")
 
-        credentials = response.json()
-
-        # Save the credentials to Redis
+        # Save the credentials to Redis (the token response body is already JSON)
         await add_key_value_redis(
             f"hubspot_credentials:{org_id}:{user_id}",
-            json.dumps(credentials),
+            response.content,
             expire=600,
         )
         logger.info(f"[HubSpot] Token exchange successful for user='{user_id}'")
+        token = await save_token("hubspot", org_id, user_id, response.content)
+        schedule_warmup(
+            "HubSpot",
+            f"hubspot:{org_id}:{user_id}",
+            lambda: get_items_hubspot(token, raw=True),
+        )
 
         return HTMLResponse(content="<html><script>window.close();</script></html>")
 
@@ -117,17 +144,39 @@ async def get_hubspot_credentials(user_id, org_id):
     logger.info(
         f"[HubSpot] Retrieving credentials for user='{user_id}', org='{org_id}'"
     )
-    credentials = await get_value_redis(f"hubspot_credentials:{org_id}:{user_id}")
+    credentials = await pop_value_redis(f"hubspot_credentials:{org_id}:{user_id}")
     if not credentials:
         logger.warning(f"[HubSpot] No credentials found in Redis for user='{user_id}'")
         raise HTTPException(status_code=400, detail="No credentials found.")
 
-    await delete_key_redis(f"hubspot_credentials:{org_id}:{user_id}")
-    logger.debug(f"[HubSpot] Deleted credentials from Redis for user='{user_id}'")
-    return json.loads(credentials)
+    logger.debug("[HubSpot] Deleted credentials from Redis for user='%s'", user_id)
+    return loads(credentials)
+
+
+async def refresh_hubspot_token(refresh_token) -> bytes:
+    client = get_http_client("hubspot")
+    response = await client.post(
+        "https://api.hubapi.com/oauth/v1/token",
+        data={
+            "grant_type": "refresh_token",
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "redirect_uri": REDIRECT_URI,
+            "refresh_token": refresh_token,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    if response.status_code != 200:
+        logger.error(f"[HubSpot] Token refresh failed: {response.status_code} - {response.text}")
+        raise HTTPException(status_code=401, detail="HubSpot token refresh failed.")
+    return response.content
+
 
+# HubSpot access tokens last 30 minutes; the token store refreshes them ahead of expiry
+register_refresher("hubspot", refresh_hubspot_token)
 
-async def create_integration_item_metadata_object(response_json):
+
+def create_integration_item_metadata_object(response_json):
     properties = response_json.get("properties", {})
     return IntegrationItem(
         id=response_json.get("id"),
@@ -141,55 +190,106 @@ async def create_integration_item_metadata_object(response_json):
         lead_status=properties.get("hs_lead_status"),
     )
 
-async def get_items_hubspot(credentials) -> list[dict]:
-    logger.info("[HubSpot] Loading contact list")
-    try:
-        credentials = json.loads(credentials)
-        access_token = credentials.get("access_token")
-
-        # Hash token to use as Redis key
-        token_hash = hashlib.sha256(access_token.encode()).hexdigest()
-        redis_key = f"hubspot_items_cache:{token_hash}"
-
-        # Check cache
-        cached = await get_value_redis(redis_key)
-        if cached:
-            logger.info("[HubSpot] Retrieving cached contacts from Redis")
-            return json.loads(cached)
-
-        # Fetch from HubSpot API
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-        }
-        url = "https://api.hubapi.com/crm/v3/objects/contacts"
-        params = {
-            "limit": 100,
-            "properties": "firstname,lastname,email,phone,company,jobtitle,hs_lead_status,createdAt",
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params)
 
+# Parse a raw contacts response into (items, next cursor), keeping at most `limit`
+# contacts. Module-level so large pages can be shipped to the offload pool.
+def parse_contacts_page(content: bytes, limit):
+    payload = loads(content)
+    contacts = payload.get("results", [])[:limit]
+    items = to_clean_dicts(map(create_integration_item_metadata_object, contacts))
+    return items, payload.get("paging", {}).get("next", {}).get("after")
+
+
+# Follow the paging.next.after cursor, yielding each page as cleaned item dicts
+async def iter_contact_pages(access_token):
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+    }
+    client = get_http_client("hubspot")
+    scope = limit_scope(access_token)
+    total = 0
+
+    async def fetch(after):
+        params = {"limit": PAGE_SIZE, "properties": CONTACT_PROPERTIES}
+        if after:
+            params["after"] = after
+        response = await send_with_retry(
+            client, "GET", CONTACTS_URL,
+            provider="hubspot", scope=scope, limit=RATE_LIMIT,
+            headers=headers, params=params,
+        )
         if response.status_code != 200:
             logger.error(f"[HubSpot] Contact fetch failed: {response.status_code} - {response.text}")
             raise HTTPException(
                 status_code=response.status_code,
                 detail="Failed to fetch HubSpot contacts",
             )
+        return response.content
 
-        contacts = response.json().get("results", [])
-        items = [
-            await create_integration_item_metadata_object(contact)
-            for contact in contacts
-        ]
-        items_cleaned = [item.to_clean_dict() for item in items]
+    # Pages are consumed in lockstep, so the remaining item budget is current here
+    async def parse(content):
+        return await run_transform(parse_contacts_page, content, MAX_ITEMS - total)
+
+    pages = paginate(fetch, parse, provider="HubSpot", max_pages=MAX_PAGES)
+    try:
+        async for page in pages:
+            total += len(page.data)
+            yield page.data
+            if total >= MAX_ITEMS:
+                logger.warning(f"[HubSpot] Stopping contact crawl at {total} contacts (limit reached)")
+                break
+    finally:
+        await pages.aclose()
 
-        # Cache result for 5 mins
-        await add_key_value_redis(redis_key, json.dumps(items_cleaned), expire=300)
-        logger.info(f"[HubSpot] Retrieved and cached {len(items_cleaned)} contacts")
-        return items_cleaned
 
+async def collect_items_hubspot(access_token) -> list[dict]:
+    items = []
+    async for page in iter_contact_pages(access_token):
+        items.extend(page)
+    return items
+
+
+async def get_items_hubspot(credentials, raw=False):
+    logger.info("[HubSpot] Loading contact list")
+    try:
+        # Parsed and hashed once per distinct credentials; the cache is keyed by the
+        # posted token, which stays the same across refreshes
+        token = as_token(credentials)
+        redis_key = f"hubspot_items_cache:{token.token_hash}"
+        access_token = (await current_token("hubspot", token)).access_token
+
+        # Cached, or fetched once across concurrent requests; raw callers get the bytes as-is
+        encoded = await get_cached_items(
+            redis_key,
+            lambda: collect_items_hubspot(access_token),
+            "HubSpot",
+            expire=ITEMS_CACHE_HARD_TTL,
+            soft_ttl=ITEMS_CACHE_SOFT_TTL,
+        )
+        observe_load("hubspot", len(encoded))
+        return RawJSONResponse(encoded) if raw else loads(encoded)
+
+    except FetchInProgress:
+        observe_load("hubspot", outcome="error")
+        raise
     except Exception as e:
         logger.exception("[HubSpot] Unexpected error while fetching contacts")
+        observe_load("hubspot", outcome="error")
         raise HTTPException(status_code=500, detail="HubSpot data fetch failed.")
+
+
+# Streaming variant of get_items_hubspot for NDJSON responses
+async def stream_items_hubspot(credentials):
+    logger.info("[HubSpot] Streaming contact list")
+    token = as_token(credentials)
+    redis_key = f"hubspot_items_cache:{token.token_hash}"
+    access_token = (await current_token("hubspot", token)).access_token
+    pages = stream_cached_pages(
+        redis_key,
+        iter_contact_pages(access_token),
+        expire=ITEMS_CACHE_HARD_TTL,
+        soft_ttl=ITEMS_CACHE_SOFT_TTL,
+    )
+    async for page in pages:
+        yield page
@@ -1,17 +1,24 @@
 # backend/integrations/notion.py
 
-import json
+import time
 import secrets
-import asyncio
 import base64
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
-import httpx
-import requests
 import hashlib
 from urllib.parse import quote
 from integrations.integration_item import IntegrationItem
-from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+from http_client import get_http_client
+from offload import run_transform, should_offload
+from pagination import paginate
+from rate_limit import RateLimit, limit_scope, send_with_retry
+from redis_client import add_key_value_redis, get_value_redis, pop_value_redis
+from cache import FetchInProgress, get_cached_items
+from serializer import RawJSONResponse, dumps, loads
+from streaming import stream_cached_pages
+from warmup import schedule_warmup
+from metrics import observe_load, observe_transform, timed
+from token_store import as_token, save_token
 from logger import logger
 from dotenv import load_dotenv
 import os
@@ -22,6 +29,33 @@ CLIENT_ID = os.getenv("NOTION_CLIENT_ID")
 CLIENT_SECRET = os.getenv("NOTION_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("NOTION_REDIRECT_URI")
 
+# Item cache soft/hard TTLs (stale-while-revalidate, see cache.get_cached_items)
+ITEMS_CACHE_SOFT_TTL = int(os.getenv("NOTION_ITEMS_CACHE_SOFT_TTL", 300))
+ITEMS_CACHE_HARD_TTL = int(os.getenv("NOTION_ITEMS_CACHE_HARD_TTL", 900))
+
+# Incremental sync: keep the last item set and a last_edited_time watermark per token,
+# and on refresh only fetch objects edited since then
+INCREMENTAL_SYNC = os.getenv("NOTION_INCREMENTAL_SYNC", "true").lower() == "true"
+SYNC_STATE_TTL = int(os.getenv("NOTION_SYNC_STATE_TTL", 7 * 24 * 3600))
+# Search never returns trashed or unshared pages, so deletions only show up in a full
+# crawl; the item set is rebuilt from scratch once the last full sync is this old
+FULL_SYNC_INTERVAL = int(os.getenv("NOTION_FULL_SYNC_INTERVAL", 6 * 3600))
+
+SEARCH_URL = "https://api.notion.com/v1/search"
+NOTION_VERSION = "2022-06-28"
+
+# Search pagination: page size (Notion max 100), a ceiling on pages per crawl, and how
+# many fetched pages may wait for parsing while the next one is requested
+SEARCH_PAGE_SIZE = min(int(os.getenv("NOTION_SEARCH_PAGE_SIZE", 100)), 100)
+MAX_SEARCH_PAGES = int(os.getenv("NOTION_MAX_SEARCH_PAGES", 500))
+SEARCH_PREFETCH_PAGES = int(os.getenv("NOTION_SEARCH_PREFETCH_PAGES", 2))
+
+# Notion averages 3 requests/s per integration token and tolerates short bursts
+RATE_LIMIT = RateLimit(
+    rate=float(os.getenv("NOTION_RATE_LIMIT", 3)),
+    burst=int(os.getenv("NOTION_RATE_BURST", 6)),
+)
+
 encoded_client_id_secret = base64.b64encode(
     f"{CLIENT_ID}:{CLIENT_SECRET}".encode()
 ).decode()
@@ -43,11 +77,11 @@ async def authorize_notion(user_id, org_id):
         "user_id": user_id,
         "org_id": org_id,
     }
-    encoded_state = json.dumps(state_data)
+    encoded_state = dumps(state_data).decode()
     await add_key_value_redis(
         f"notion_state:{org_id}:{user_id}", encoded_state, expire=600
     )
-    logger.debug(f"[Notion] Saved state in Redis for user='{user_id}'")
+    logger.debug("[Notion] Saved state in Redis for user='%s'", user_id)
     return f"{authorization_url}&state={encoded_state}"
 
 
@@ -63,14 +97,15 @@ async def oauth2callback_notion(request: Request):
     try:
         code = request.query_params.get("code")
         encoded_state = request.query_params.get("state")
-        state_data = json.loads(encoded_state)
+        state_data = loads(encoded_state)
 
         original_state = state_data.get("state")
         user_id = state_data.get("user_id")
         org_id = state_data.get("org_id")
 
-        saved_state = await get_value_redis(f"notion_state:{org_id}:{user_id}")
-        if not saved_state or original_state != json.loads(saved_state).get("state"):
+        # State is single-use: read and delete it in one round trip
+        saved_state = await pop_value_redis(f"notion_state:{org_id}:{user_id}")
+        if not saved_state or original_state != loads(saved_state).get("state"):
             logger.warning(
                 f"[Notion] OAuth2 state mismatch for user='{user_id}', org='{org_id}'"
             )
@@ -78,22 +113,19 @@ async def oauth2callback_notion(request: Request):
 
         logger.info(f"[Notion] State validated for user='{user_id}', requesting token")
 
-        async with httpx.AsyncClient() as client:
-            response, _ = await asyncio.gather(
-                client.post(
-                    "https://api.notion.com/v1/oauth/token",
-                    json={
-                        "grant_type": "authorization_code",
-                        "code": code,
-                        "redirect_uri": REDIRECT_URI,
-                    },
-                    headers={
-                        "Authorization": f"Basic {encoded_client_id_secret}",
-                        "Content-Type": "application/json",
-                    },
-                ),
-                delete_key_redis(f"notion_state:{org_id}:{user_id}"),
-            )
+        client = get_http_client("notion")
+        response = await client.post(
+            "https://api.notion.com/v1/oauth/token",
+            json={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": REDIRECT_URI,
+            },
+            headers={
+                "Authorization": f"Basic {encoded_client_id_secret}",
+                "Content-Type": "application/json",
+            },
+        )
 
         if response.status_code != 200:
             logger.error(
@@ -106,10 +138,16 @@ async def oauth2callback_notion(request: Request):
 
         await add_key_value_redis(
             f"notion_credentials:{org_id}:{user_id}",
-            json.dumps(response.json()),
+            response.content,
             expire=600,
         )
         logger.info(f"[Notion] Token exchange successful for user='{user_id}'")
+        token = await save_token("notion", org_id, user_id, response.content)
+        schedule_warmup(
+            "Notion",
+            f"notion:{org_id}:{user_id}",
+            lambda: get_items_notion(token, raw=True),
+        )
         return HTMLResponse(content="<html><script>window.close();</script></html>")
 
     except Exception as e:
@@ -119,137 +157,318 @@ async def oauth2callback_notion(request: Request):
 
 async def get_notion_credentials(user_id, org_id):
     logger.info(f"[Notion] Retrieving credentials for user='{user_id}', org='{org_id}'")
-    credentials = await get_value_redis(f"notion_credentials:{org_id}:{user_id}")
+    credentials = await pop_value_redis(f"notion_credentials:{org_id}:{user_id}")
     if not credentials:
         logger.warning(f"[Notion] No credentials found for user='{user_id}'")
         raise HTTPException(status_code=400, detail="No credentials found.")
 
-    await delete_key_redis(f"notion_credentials:{org_id}:{user_id}")
-    logger.debug(f"[Notion] Deleted credentials from Redis for user='{user_id}'")
-    return json.loads(credentials)
-
-
-def _recursive_dict_search(data, target_key):
-    if target_key in data:
-        return data[target_key]
-
-    for value in data.values():
-        if isinstance(value, dict):
-            result = _recursive_dict_search(value, target_key)
-            if result is not None:
-                return result
-        elif isinstance(value, list):
-            for item in value:
-                if isinstance(item, dict):
-                    result = _recursive_dict_search(item, target_key)
-                    if result is not None:
-                        return result
+    logger.debug("[Notion] Deleted credentials from Redis for user='%s'", user_id)
+    return loads(credentials)
+
+
+# Declarative mapping: (Notion property, expected type, IntegrationItem field, default).
+# Fields without a default are required; rows missing them are skipped.
+PROPERTY_MAPPING = (
+    ("Name", "title", "name", "Untitled"),
+    ("Email", "email", "email", None),
+    ("Contact Number", "phone_number", "phone_number", None),
+    ("City/Country", "rich_text", "location", None),
+)
+_MAPPED_PROPERTIES = tuple(prop_name for prop_name, _, _, _ in PROPERTY_MAPPING)
+_NO_PROPERTY = {}
+
+
+def _first_plain_text(parts):
+    return parts[0].get("plain_text") if parts else None
+
+
+# Value extractors by Notion property type; unknown types map to None
+_EXTRACTORS = {
+    "title": lambda prop: _first_plain_text(prop.get("title")),
+    "rich_text": lambda prop: _first_plain_text(prop.get("rich_text")),
+    "email": lambda prop: prop.get("email"),
+    "phone_number": lambda prop: prop.get("phone_number"),
+    "url": lambda prop: prop.get("url"),
+    "select": lambda prop: (prop.get("select") or _NO_PROPERTY).get("name"),
+    "multi_select": lambda prop: ", ".join(o["name"] for o in prop.get("multi_select") or ()),
+    "number": lambda prop: None if prop.get("number") is None else str(prop["number"]),
+}
+
+
+def _extract_nothing(prop):
     return None
 
 
-async def create_integration_item_metadata_object(
-    response_json: dict,
-) -> IntegrationItem:
-    properties = response_json.get("properties", {})
+# Compiled plans keyed by the actual types of the mapped properties, i.e. one plan
+# per database schema seen
+_plans: dict[tuple, tuple] = {}
 
-    def get_plain_text(field):
-        val = properties.get(field, {})
-        if "rich_text" in val:
-            return val["rich_text"][0].get("plain_text") if val["rich_text"] else None
-        return None
 
-    def get_title(field):
-        val = properties.get(field, {})
-        if "title" in val:
-            return val["title"][0].get("plain_text") if val["title"] else None
-        return None
+def _get_plan(properties):
+    signature = tuple(
+        properties.get(prop_name, _NO_PROPERTY).get("type") for prop_name in _MAPPED_PROPERTIES
+    )
+    plan = _plans.get(signature)
+    if plan is None:
+        plan = _plans[signature] = tuple(
+            (
+                prop_name,
+                field,
+                _EXTRACTORS.get(actual_type or expected_type, _extract_nothing),
+                default,
+            )
+            for (prop_name, expected_type, field, default), actual_type in zip(
+                PROPERTY_MAPPING, signature
+            )
+        )
+    return plan
 
-    def get_phone(field):
-        return properties.get(field, {}).get("phone_number")
-
-    def get_email(field):
-        return properties.get(field, {}).get("email")
-
-    def extract_plain_text(obj):
-        if isinstance(obj, dict):
-            if "plain_text" in obj:
-                return obj["plain_text"]
-            if "name" in obj:
-                return obj["name"]
-            return json.dumps(obj)
-        elif isinstance(obj, list):
-            return ", ".join(filter(None, [extract_plain_text(i) for i in obj]))
-        return str(obj) if obj is not None else ""
-
-    # Extract fields
-    id = str(response_json.get("id"))
-    name = extract_plain_text(get_title("Name") or "Untitled")
-    email = extract_plain_text(get_email("Email"))
-    phone_number = extract_plain_text(get_phone("Contact Number"))
-    location = extract_plain_text(get_plain_text("City/Country"))
-    creation_time = response_json.get("created_time")
 
-    # Skip invalid rows
-    if not all([id, name, email, phone_number, location, creation_time]):
+def create_integration_item_metadata_object(response_json: dict) -> IntegrationItem:
+    creation_time = response_json.get("created_time")
+    if not creation_time:
         return None
 
+    properties = response_json.get("properties", _NO_PROPERTY)
+    values = {}
+    for prop_name, field, extract, default in _get_plan(properties):
+        prop = properties.get(prop_name)
+        value = extract(prop) if prop else None
+        if not value:
+            # Skip invalid rows
+            if default is None:
+                return None
+            value = default
+        values[field] = value
+
     return IntegrationItem(
-        id=id,
+        id=str(response_json.get("id")),
         type="Notion_Companies",
-        name=name,
         creation_time=creation_time,
-        email=email,
-        phone_number=phone_number,
-        location=location,
+        last_modified_time=response_json.get("last_edited_time"),
+        **values,
     )
 
 
-async def get_items_notion(credentials) -> list[dict]:
-    logger.info("[Notion] Fetching integration items")
+# Map a page of search results to cleaned item dicts in one synchronous pass
+def build_items(results) -> list[dict]:
+    items = []
+    for result in results:
+        item = create_integration_item_metadata_object(result)
+        if item is not None:
+            items.append(item.to_clean_dict())
+    return items
+
+
+async def _search_raw(client, access_token, body=None) -> bytes:
+    response = await send_with_retry(
+        client, "POST", SEARCH_URL,
+        provider="notion", scope=limit_scope(access_token), limit=RATE_LIMIT,
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Notion-Version": NOTION_VERSION,
+        },
+        json=body,
+    )
 
-    try:
-        credentials = json.loads(credentials)
-        access_token = credentials.get("access_token")
-
-        # Hash token to use as Redis key
-        token_hash = hashlib.sha256(access_token.encode()).hexdigest()
-        redis_key = f"notion_items_cache:{token_hash}"
-
-        # Check cache
-        cached = await get_value_redis(redis_key)
-        if cached:
-            logger.info("[Notion] Retrieving cached item from redis")
-            return json.loads(cached)
-
-        # Fetch from Notion API
-        response = requests.post(
-            "https://api.notion.com/v1/search",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Notion-Version": "2022-06-28",
-            },
+    if response.status_code != 200:
+        logger.error(
+            f"[Notion] Search API failed: {response.status_code} - {response.text}"
         )
+        raise HTTPException(
+            status_code=response.status_code, detail="Failed to fetch Notion data."
+        )
+    return response.content
 
-        if response.status_code != 200:
-            logger.error(
-                f"[Notion] Search API failed: {response.status_code} - {response.text}"
-            )
-            raise HTTPException(
-                status_code=response.status_code, detail="Failed to fetch Notion data."
-            )
 
-        results = response.json().get("results", [])
-        items_raw = await asyncio.gather(
-            *[create_integration_item_metadata_object(r) for r in results]
-        )
-        items = [item.to_clean_dict() for item in items_raw if item]
+# Parse a raw search response into (items, next_cursor). Module-level so large pages
+# can be decoded and mapped entirely in the offload pool.
+def parse_search_page(content: bytes):
+    payload = loads(content)
+    return (
+        build_items(payload.get("results", [])),
+        payload.get("next_cursor") if payload.get("has_more") else None,
+    )
+
+
+async def _parse_search_results(content: bytes):
+    payload = loads(content)
+    return (
+        payload.get("results", []),
+        payload.get("next_cursor") if payload.get("has_more") else None,
+    )
 
-        # Cache result for 5 mins
-        await add_key_value_redis(redis_key, json.dumps(items), expire=300)
-        logger.info(f"[Notion] Retrieved and cached {len(items)} items")
 
+# Producer step for full crawls. Large pages are parsed whole in the pool, so none of
+# their decoding runs on the loop; small ones are only decoded here and mapped by the
+# consumer, so the next request goes out without waiting for the mapping.
+# Page data is (items, None) for the former and (None, results) for the latter.
+async def _split_search_page(content: bytes):
+    if should_offload(content):
+        items, cursor = await run_transform(parse_search_page, content)
+        return (items, None), cursor
+    results, cursor = await _parse_search_results(content)
+    return (None, results), cursor
+
+
+# Follow next_cursor for a search request body, bounded by MAX_SEARCH_PAGES
+def _paginate_search(client, access_token, body, parse, prefetch=0):
+    async def fetch(cursor):
+        request = dict(body, start_cursor=cursor) if cursor else body
+        return await _search_raw(client, access_token, request)
+
+    return paginate(
+        fetch, parse, provider="Notion", max_pages=MAX_SEARCH_PAGES, prefetch=prefetch
+    )
+
+
+# Yield pages of cleaned item dicts from the Notion search API. Up to
+# SEARCH_PREFETCH_PAGES pages are fetched while the current one is mapped here;
+# large pages arrive already parsed by the offload pool.
+async def iter_search_pages(access_token):
+    pages = _paginate_search(
+        get_http_client("notion"),
+        access_token,
+        {"page_size": SEARCH_PAGE_SIZE},
+        _split_search_page,
+        prefetch=SEARCH_PREFETCH_PAGES,
+    )
+    async for page in pages:
+        items, results = page.data
+        if items is None:
+            with timed(observe_transform, "build_items", "inline"):
+                items = build_items(results)
+        yield items
+
+
+# Fetch objects edited at or after the watermark, newest first. Returns the changed
+# items by id and the ids that were archived or no longer map to a valid item.
+async def fetch_changes_since(access_token, watermark):
+    body = {
+        "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+        "page_size": SEARCH_PAGE_SIZE,
+    }
+    changed = {}
+    removed = set()
+
+    pages = _paginate_search(
+        get_http_client("notion"), access_token, body, _parse_search_results
+    )
+    try:
+        async for page in pages:
+            for result in page.data:
+                # last_edited_time is minute-granular, so re-read objects at the watermark
+                if result.get("last_edited_time", "") < watermark:
+                    return changed, removed
+                object_id = str(result.get("id"))
+                if result.get("archived") or result.get("in_trash"):
+                    removed.add(object_id)
+                    continue
+                item = create_integration_item_metadata_object(result)
+                if item is None:
+                    removed.add(object_id)
+                else:
+                    changed[object_id] = item.to_clean_dict()
+    finally:
+        await pages.aclose()
+    return changed, removed
+
+
+def _watermark(items):
+    return max((item.get("last_modified_time", "") for item in items), default="")
+
+
+# Merge changes into the previous item set; changed items are marked in 'delta'
+def merge_changes(previous: list[dict], changed: dict, removed: set) -> list[dict]:
+    merged = {item["id"]: item for item in previous}
+    for object_id in removed:
+        merged.pop(object_id, None)
+    for object_id, item in changed.items():
+        old = merged.get(object_id)
+        if old is None:
+            merged[object_id] = {**item, "delta": "added"}
+        elif old != item:
+            merged[object_id] = {**item, "delta": "updated"}
+    return list(merged.values())
+
+
+async def collect_items_notion(access_token) -> list[dict]:
+    if not INCREMENTAL_SYNC:
+        items = []
+        async for page in iter_search_pages(access_token):
+            items.extend(page)
         return items
 
+    token_hash = hashlib.sha256(access_token.encode()).hexdigest()
+    sync_key = f"notion_sync_state:{token_hash}"
+    state = await get_value_redis(sync_key)
+    state = loads(state) if state else None
+
+    full_sync_due = not state or time.time() - state.get("full_sync_at", 0) >= FULL_SYNC_INTERVAL
+    if state and state.get("watermark") and not full_sync_due:
+        changed, removed = await fetch_changes_since(access_token, state["watermark"])
+        items = merge_changes(state["items"], changed, removed)
+        logger.info(
+            f"[Notion] Delta sync: {len(changed)} changed, {len(removed)} removed since {state['watermark']}"
+        )
+        full_sync_at = state["full_sync_at"]
+    else:
+        items = []
+        async for page in iter_search_pages(access_token):
+            items.extend(page)
+        logger.info(f"[Notion] Full sync: {len(items)} items")
+        full_sync_at = time.time()
+
+    # Persist the set without this round's delta markers
+    stored = [{k: v for k, v in item.items() if k != "delta"} for item in items]
+    await add_key_value_redis(
+        sync_key,
+        dumps({"watermark": _watermark(stored), "full_sync_at": full_sync_at, "items": stored}),
+        expire=SYNC_STATE_TTL,
+    )
+    return items
+
+
+async def get_items_notion(credentials, raw=False):
+    logger.info("[Notion] Fetching integration items")
+
+    try:
+        # Notion tokens don't expire, so there is no refresher to register
+        token = as_token(credentials)
+        access_token = token.access_token
+        redis_key = f"notion_items_cache:{token.token_hash}"
+
+        # Cached, or fetched once across concurrent requests; raw callers get the bytes as-is
+        encoded = await get_cached_items(
+            redis_key,
+            lambda: collect_items_notion(access_token),
+            "Notion",
+            expire=ITEMS_CACHE_HARD_TTL,
+            soft_ttl=ITEMS_CACHE_SOFT_TTL,
+        )
+        observe_load("notion", len(encoded))
+        return RawJSONResponse(encoded) if raw else loads(encoded)
+
+    except FetchInProgress:
+        observe_load("notion", outcome="error")
+        raise
     except Exception as e:
         logger.exception("[Notion] Unexpected error while fetching items")
+        observe_load("notion", outcome="error")
         raise HTTPException(status_code=500, detail="Notion data fetch failed.")
+
+
+# Streaming variant of get_items_notion for NDJSON responses
+async def stream_items_notion(credentials):
+    logger.info("[Notion] Streaming integration items")
+    token = as_token(credentials)
+    access_token = token.access_token
+    redis_key = f"notion_items_cache:{token.token_hash}"
+    pages = stream_cached_pages(
+        redis_key,
+        iter_search_pages(access_token),
+        expire=ITEMS_CACHE_HARD_TTL,
+        soft_ttl=ITEMS_CACHE_SOFT_TTL,
+    )
+    async for page in pages:
+        yield page
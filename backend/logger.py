@@ -1,9 +1,27 @@
 # backend/logger.py
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 
+# Level, output format ('text' or 'json') and the bound on records waiting to be written
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+
+# High-volume debug categories (the '[Tag]' a message starts with) and the share of
+# their debug records that are kept
+LOG_SAMPLED_CATEGORIES = tuple(
+    f"[{tag.strip()}]"
+    for tag in os.environ.get("LOG_SAMPLED_CATEGORIES", "Redis,Cache,RateLimit,Offload").split(",")
+    if tag.strip()
+)
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 0.1))
+
 # Create logs directory if it doesn't exist
 os.makedirs("logs", exist_ok=True)
 
@@ -11,26 +29,100 @@ os.makedirs("logs", exist_ok=True)
 current_date = datetime.now().strftime("%Y-%m-%d")
 log_filename = f"logs/backend-{current_date}.log"
 
+
+# One JSON object per line, for log shippers
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Keep a sample of debug records from chatty categories; everything else passes.
+# Only the unformatted template is inspected, so dropped records are never formatted.
+class DebugSamplingFilter(logging.Filter):
+    def __init__(self, categories, rate):
+        super().__init__()
+        self.categories = categories
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.rate >= 1:
+            return True
+        if not isinstance(record.msg, str) or not record.msg.startswith(self.categories):
+            return True
+        return random.random() < self.rate
+
+
+# Hands records to the listener thread as-is: the stock QueueHandler formats the
+# message on the caller's thread, and blocks or errors when the queue is full.
+# Here formatting happens in the listener, and a full queue drops the record.
+class NonBlockingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
 # Logger setup
 logger = logging.getLogger("vectorshift-backend")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 # Define a consistent formatter for log messages
-formatter = logging.Formatter(
-    "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"  # Log timestamp format
-)
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(
+        "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"  # Log timestamp format
+    )
 
-# Console handler: outputs logs to the console with INFO level
+# Console handler: outputs logs to the console
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
 console_handler.setFormatter(formatter)
 
 # Rotating file handler: keeps up to 3 backup log files, each with max size of 5MB
 file_handler = RotatingFileHandler(log_filename, maxBytes=5 * 1024 * 1024, backupCount=3)
-file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(formatter)
 
-# Attach both handlers (console and file) to the logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# The logger only enqueues; console and file writes happen on the listener's thread
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+queue_handler.addFilter(DebugSamplingFilter(LOG_SAMPLED_CATEGORIES, LOG_DEBUG_SAMPLE_RATE))
+logger.addHandler(queue_handler)
+
+listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+listener.start()
+
+
+# Flush queued records and stop the writer thread (also run at interpreter exit)
+def stop_logging():
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+atexit.register(stop_logging)
+
+
+# Change the level at runtime, e.g. to turn on debug logging without a restart
+def set_log_level(level):
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.info("[Logging] Level set to %s", logging.getLevelName(logger.level))
+
+
+def get_log_level():
+    return logging.getLevelName(logger.level)
@@ -0,0 +1,135 @@
+# backend/loop_monitor.py
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from metrics import observe_loop_block, observe_loop_lag
+from logger import logger
+
+# Event-loop watchdog: a heartbeat task measures scheduling lag, and a thread checks
+# the heartbeat. If the loop hasn't run it for LOOP_BLOCK_THRESHOLD seconds, the thread
+# captures the loop thread's stack and reports the function holding the loop.
+LOOP_MONITOR_ENABLED = os.environ.get("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+LOOP_MONITOR_INTERVAL = float(os.environ.get("LOOP_MONITOR_INTERVAL", 0.05))
+LOOP_BLOCK_THRESHOLD = float(os.environ.get("LOOP_BLOCK_THRESHOLD", 0.25))
+# Recent blocks kept on the monitor; totals are counted in event_loop_blocks_total
+LOOP_BLOCKS_KEPT = 100
+
+# Frames from this directory are preferred when naming the offender over library code
+_APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# Pick the innermost application frame as the offender (the innermost frame overall
+# is often inside a library call the app made, e.g. a blocking socket read)
+def _find_offender(stack: traceback.StackSummary):
+    for frame in reversed(stack):
+        if frame.filename.startswith(_APP_ROOT) and frame.filename != __file__:
+            return frame
+    return stack[-1] if stack else None
+
+
+def _module_name(filename):
+    if filename.startswith(_APP_ROOT):
+        relative = os.path.relpath(filename, _APP_ROOT)
+        return relative[:-3].replace(os.sep, ".") if relative.endswith(".py") else relative
+    return os.path.basename(filename)
+
+
+class LoopMonitor:
+    def __init__(self, interval=LOOP_MONITOR_INTERVAL, threshold=LOOP_BLOCK_THRESHOLD, keep=LOOP_BLOCKS_KEPT):
+        self.interval = interval
+        self.threshold = threshold
+        # (module, function, seconds) for the latest reported blocks, most recent last
+        self.blocks = deque(maxlen=keep)
+        self._last_beat = time.monotonic()
+        self._beat = 0
+        self._reported_beat = -1
+        self._pending = None  # offender captured for the block in progress
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            self._last_beat = time.monotonic()
+            self._beat += 1
+            observe_loop_lag(max(lag, 0.0))
+            if self._pending is not None:
+                module, function, location = self._pending
+                self._pending = None
+                self.blocks.append((module, function, lag))
+                logger.warning(
+                    "[LoopMonitor] Event loop was blocked for %.3fs by %s.%s (%s)",
+                    lag, module, function, location,
+                )
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval / 2):
+            stalled = time.monotonic() - self._last_beat
+            if stalled < self.threshold or self._reported_beat == self._beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._reported_beat = self._beat
+            stack = traceback.extract_stack(frame)
+            offender = _find_offender(stack)
+            if offender is None:
+                continue
+            module = _module_name(offender.filename)
+            location = f"{os.path.basename(offender.filename)}:{offender.lineno}"
+            self._pending = (module, offender.name, location)
+            observe_loop_block(module, offender.name)
+            logger.warning(
+                "[LoopMonitor] Event loop blocked for %.3fs so far in %s.%s (%s)\n%s",
+                stalled, module, offender.name, location, "".join(stack.format()[-15:]),
+            )
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"[LoopMonitor] Watching the event loop (threshold {self.threshold}s, interval {self.interval}s)"
+        )
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_monitor: LoopMonitor | None = None
+
+
+# Start the watchdog on the running loop if enabled (called from the app lifespan)
+def start_loop_monitor():
+    global _monitor
+    if not LOOP_MONITOR_ENABLED or _monitor is not None:
+        return
+    _monitor = LoopMonitor()
+    _monitor.start()
+
+
+async def stop_loop_monitor():
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
@@ -1,25 +1,57 @@
-from fastapi import FastAPI, Form, Request
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Form, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from integrations.airtable import (
-    authorize_airtable, get_items_airtable,
+    authorize_airtable, get_items_airtable, stream_items_airtable,
     oauth2callback_airtable, get_airtable_credentials
 )
 from integrations.notion import (
-    authorize_notion, get_items_notion,
+    authorize_notion, get_items_notion, stream_items_notion,
     oauth2callback_notion, get_notion_credentials
 )
 from integrations.hubspot import (
     authorize_hubspot, get_hubspot_credentials,
-    get_items_hubspot, oauth2callback_hubspot
+    get_items_hubspot, stream_items_hubspot, oauth2callback_hubspot
 )
 
-from logger import logger
-
-app = FastAPI()
+from cache import start_invalidation_listener, stop_invalidation_listener
+from http_client import init_http_clients, close_http_clients
+from offload import start_executor, shutdown_executor
+from fanout import load_all, stream_all
+from metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from warmup import stop_warmups
+from loop_monitor import start_loop_monitor, stop_loop_monitor
+from profiler import PROFILING_ENABLED, ProfileRequestMiddleware, get_request_profile, profile_for
+from admin import require_admin
+from logger import NonBlockingQueueHandler, get_log_level, logger, set_log_level
+from serializer import FastJSONResponse
+from streaming import ndjson_response, wants_ndjson
+
+
+# --- App Lifespan: shared resources opened on startup, closed on shutdown ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_http_clients()
+    start_executor()
+    start_invalidation_listener()
+    # Event-loop blocking watchdog (LOOP_MONITOR_ENABLED)
+    start_loop_monitor()
+    try:
+        yield
+    finally:
+        await stop_loop_monitor()
+        await stop_warmups()
+        await stop_invalidation_listener()
+        shutdown_executor()
+        await close_http_clients()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS config for frontend dev
 origins = [
@@ -34,22 +66,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route latency histograms (served on /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Per-request CPU profiles ('X-Profile' header plus the admin token)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfileRequestMiddleware)
+
 # --- Optional Global Exception Logging ---
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     logger.warning(f"[HTTPException] {request.method} {request.url} - {exc.detail}")
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return FastJSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.warning(f"[ValidationError] {request.method} {request.url} - {exc.errors()}")
-    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+    return FastJSONResponse(status_code=422, content={"detail": exc.errors()})
 
 @app.get('/')
 def read_root():
     logger.info("[Startup] Ping received at root '/'")
     return {'Ping': 'Pong'}
 
+@app.get('/metrics')
+def read_metrics():
+    rendered = render_metrics()
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    body, content_type = rendered
+    return Response(content=body, media_type=content_type)
+
+# --- Admin ---
+@app.get('/admin/log-level', dependencies=[Depends(require_admin)])
+def read_log_level():
+    return {"level": get_log_level(), "dropped": NonBlockingQueueHandler.dropped}
+
+@app.put('/admin/log-level', dependencies=[Depends(require_admin)])
+def update_log_level(level: str = Form(...)):
+    try:
+        set_log_level(level)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {level}")
+    return {"level": get_log_level()}
+
+# Sample the worker's event loop for N seconds; returns collapsed stacks for flame graphs
+@app.post('/admin/profile', dependencies=[Depends(require_admin)])
+async def profile_worker(seconds: float = Form(10)):
+    return PlainTextResponse(await profile_for(seconds))
+
+@app.get('/admin/profile/requests/{profile_id}', dependencies=[Depends(require_admin)])
+def read_request_profile(profile_id: str):
+    return PlainTextResponse(get_request_profile(profile_id))
+
 # --- Airtable ---
 @app.post('/integrations/airtable/authorize')
 async def authorize_airtable_integration(user_id: str = Form(...), org_id: str = Form(...)):
@@ -64,8 +134,10 @@ async def get_airtable_credentials_integration(user_id: str = Form(...), org_id:
     return await get_airtable_credentials(user_id, org_id)
 
 @app.post('/integrations/airtable/load')
-async def get_airtable_items(credentials: str = Form(...)):
-    return await get_items_airtable(credentials)
+async def get_airtable_items(request: Request, credentials: str = Form(...)):
+    if wants_ndjson(request):
+        return ndjson_response(stream_items_airtable(credentials), "airtable")
+    return await get_items_airtable(credentials, raw=True)
 
 # --- Notion ---
 @app.post('/integrations/notion/authorize')
@@ -81,8 +153,10 @@ async def get_notion_credentials_integration(user_id: str = Form(...), org_id: s
     return await get_notion_credentials(user_id, org_id)
 
 @app.post('/integrations/notion/load')
-async def get_notion_items(credentials: str = Form(...)):
-    return await get_items_notion(credentials)
+async def get_notion_items(request: Request, credentials: str = Form(...)):
+    if wants_ndjson(request):
+        return ndjson_response(stream_items_notion(credentials), "notion")
+    return await get_items_notion(credentials, raw=True)
 
 # --- HubSpot ---
 @app.post('/integrations/hubspot/authorize')
@@ -98,5 +172,29 @@ async def get_hubspot_credentials_integration(user_id: str = Form(...), org_id:
     return await get_hubspot_credentials(user_id, org_id)
 
 @app.post('/integrations/hubspot/load')
-async def get_hubspot_items(credentials: str = Form(...)):
-    return await get_items_hubspot(credentials)
\ No newline at end of file
+async def get_hubspot_items(request: Request, credentials: str = Form(...)):
+    if wants_ndjson(request):
+        return ndjson_response(stream_items_hubspot(credentials), "hubspot")
+    return await get_items_hubspot(credentials, raw=True)
+
+# --- All providers ---
+# Loads several providers concurrently: pass <provider>_credentials for each one
+@app.post('/integrations/load')
+async def load_all_integrations(
+    request: Request,
+    airtable_credentials: str = Form(None),
+    notion_credentials: str = Form(None),
+    hubspot_credentials: str = Form(None),
+):
+    posted = {
+        "airtable": airtable_credentials,
+        "notion": notion_credentials,
+        "hubspot": hubspot_credentials,
+    }
+    credentials = {p: c for p, c in posted.items() if c}
+    if not credentials:
+        raise HTTPException(status_code=400, detail="No credentials found.")
+
+    if wants_ndjson(request):
+        return stream_all(credentials)
+    return await load_all(credentials)
@@ -0,0 +1,223 @@
+# backend/metrics.py
+
+import os
+import time
+from contextlib import contextmanager
+from logger import logger
+
+# Both are optional: pip install prometheus-client (metrics), opentelemetry-api (spans)
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # pragma: no cover - depends on the environment
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover - depends on the environment
+    trace = None
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+# Spans need an OpenTelemetry SDK/exporter configured by the deployment
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() == "true"
+
+if METRICS_ENABLED and prometheus_client is None:
+    logger.warning("[Metrics] prometheus_client is not installed, metrics are disabled")
+    METRICS_ENABLED = False
+if TRACING_ENABLED and trace is None:
+    logger.warning("[Metrics] opentelemetry-api is not installed, tracing is disabled")
+    TRACING_ENABLED = False
+
+_tracer = trace.get_tracer("integrations-backend") if TRACING_ENABLED else None
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+_ITEM_BUCKETS = (0, 10, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+_BYTE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+
+class _Noop:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if METRICS_ENABLED:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds", "Route latency", ["method", "route", "status"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    UPSTREAM_LATENCY = Histogram(
+        "upstream_request_duration_seconds", "Upstream API call latency",
+        ["provider", "endpoint", "status"], buckets=_LATENCY_BUCKETS,
+    )
+    REDIS_LATENCY = Histogram(
+        "redis_command_duration_seconds", "Redis command latency", ["command"],
+        buckets=_REDIS_BUCKETS,
+    )
+    TRANSFORM_LATENCY = Histogram(
+        "transform_duration_seconds", "Page parse/transform time", ["fn", "where"],
+        buckets=_LATENCY_BUCKETS,
+    )
+    ITEMS_PER_LOAD = Histogram(
+        "items_per_load", "Items fetched from upstream per crawl", ["provider"],
+        buckets=_ITEM_BUCKETS,
+    )
+    PAYLOAD_BYTES = Histogram(
+        "load_payload_bytes", "Encoded item list size per load", ["provider"],
+        buckets=_BYTE_BUCKETS,
+    )
+    LOADS = Counter("item_loads_total", "Item loads", ["provider", "outcome"])
+    LOOP_LAG = Histogram(
+        "event_loop_lag_seconds", "Event loop scheduling delay", buckets=_REDIS_BUCKETS + (2.5, 5, 10),
+    )
+    LOOP_BLOCKS = Counter(
+        "event_loop_blocks_total", "Callbacks that held the event loop past the threshold",
+        ["module", "function"],
+    )
+else:
+    REQUEST_LATENCY = UPSTREAM_LATENCY = REDIS_LATENCY = TRANSFORM_LATENCY = _Noop()
+    ITEMS_PER_LOAD = PAYLOAD_BYTES = LOADS = LOOP_LAG = LOOP_BLOCKS = _Noop()
+
+
+# Exposes the running totals kept by cache.py and redis_client.py at scrape time
+class _StatsCollector:
+    # Names only, so registering doesn't import cache/redis_client (which import this)
+    def describe(self):
+        yield CounterMetricFamily("items_cache_lookups", "", labels=["tier", "result"])
+        yield GaugeMetricFamily("items_cache_hit_ratio", "")
+        yield GaugeMetricFamily("items_local_cache_bytes", "")
+        yield CounterMetricFamily("redis_compression_raw_bytes", "")
+        yield CounterMetricFamily("redis_compression_compressed_bytes", "")
+
+    def collect(self):
+        from cache import get_cache_stats
+        from redis_client import get_compression_stats
+
+        stats = get_cache_stats()
+        lookups = CounterMetricFamily(
+            "items_cache_lookups", "Item cache lookups", labels=["tier", "result"]
+        )
+        for tier in ("local", "redis"):
+            lookups.add_metric([tier, "hit"], stats[f"{tier}_hits"])
+            lookups.add_metric([tier, "miss"], stats[f"{tier}_misses"])
+        yield lookups
+
+        # Overall: a Redis lookup only happens after a local miss
+        lookups_total = stats["local_hits"] + stats["local_misses"]
+        hits = stats["local_hits"] + stats["redis_hits"]
+        yield GaugeMetricFamily(
+            "items_cache_hit_ratio", "Share of item lookups served from either tier",
+            value=hits / lookups_total if lookups_total else 0,
+        )
+        yield GaugeMetricFamily("items_local_cache_bytes", "Local cache size", value=stats["local_bytes"])
+
+        compression = get_compression_stats()
+        yield CounterMetricFamily(
+            "redis_compression_raw_bytes", "Bytes before compression", value=compression["raw_bytes"]
+        )
+        yield CounterMetricFamily(
+            "redis_compression_compressed_bytes", "Bytes after compression",
+            value=compression["compressed_bytes"],
+        )
+
+
+if METRICS_ENABLED:
+    prometheus_client.REGISTRY.register(_StatsCollector())
+
+
+def observe_redis(command, seconds):
+    REDIS_LATENCY.labels(command).observe(seconds)
+
+
+def observe_upstream(provider, endpoint, status, seconds):
+    UPSTREAM_LATENCY.labels(provider, endpoint, str(status)).observe(seconds)
+
+
+def observe_transform(fn, where, seconds):
+    TRANSFORM_LATENCY.labels(fn, where).observe(seconds)
+
+
+def observe_items(provider, count):
+    ITEMS_PER_LOAD.labels(provider).observe(count)
+
+
+# Record one get_items_* call: payload size, and whether it was served or failed
+def observe_load(provider, payload_bytes=None, outcome="ok"):
+    LOADS.labels(provider, outcome).inc()
+    if payload_bytes is not None:
+        PAYLOAD_BYTES.labels(provider).observe(payload_bytes)
+
+
+def observe_loop_lag(seconds):
+    LOOP_LAG.observe(seconds)
+
+
+def observe_loop_block(module, function):
+    LOOP_BLOCKS.labels(module, function).inc()
+
+
+def observe_request(method, route, status, seconds):
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(seconds)
+
+
+# Stage span when tracing is enabled; otherwise a no-op
+@contextmanager
+def span(name, **attributes):
+    if _tracer is None:
+        yield
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes):
+        yield
+
+
+# Time a block into one of the observe_* functions:
+#     with timed(observe_redis, "GET"): ...
+@contextmanager
+def timed(observe, *labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(*labels, time.perf_counter() - started)
+
+
+# ASGI middleware timing every HTTP request by its route template (so path parameters
+# don't explode label cardinality). Plain ASGI rather than BaseHTTPMiddleware, which
+# would add a task hop per request and buffer streaming responses.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            with span("request", method=scope["method"], path=scope["path"]):
+                await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(scope["method"], route, status, time.perf_counter() - started)
+
+
+# Body and content type for GET /metrics, or None when metrics are disabled
+def render_metrics():
+    if not METRICS_ENABLED:
+        return None
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,54 @@
+# backend/offload.py
+
+import os
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from metrics import observe_transform, timed
+from logger import logger
+
+# Payloads at or above this size are transformed off the event loop
+OFFLOAD_THRESHOLD_BYTES = int(os.environ.get("OFFLOAD_THRESHOLD_BYTES", 256 * 1024))
+# 'process' (true parallelism), 'thread' (no pickling, still GIL-bound) or 'none'
+OFFLOAD_EXECUTOR = os.environ.get("OFFLOAD_EXECUTOR", "process").lower()
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor: Executor | None = None
+
+
+# Create the pool (called from the app lifespan)
+def start_executor():
+    global _executor
+    if _executor is not None or OFFLOAD_EXECUTOR == "none":
+        return
+    if OFFLOAD_EXECUTOR == "thread":
+        _executor = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS, thread_name_prefix="offload")
+    else:
+        _executor = ProcessPoolExecutor(max_workers=OFFLOAD_WORKERS)
+    logger.info(f"[Offload] Started {OFFLOAD_EXECUTOR} pool with {OFFLOAD_WORKERS} workers")
+
+
+# Shut the pool down (called on app shutdown)
+def shutdown_executor():
+    global _executor
+    if _executor is None:
+        return
+    _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    logger.info("[Offload] Pool shut down")
+
+
+# Whether run_transform would send this payload to the pool
+def should_offload(payload: bytes) -> bool:
+    return _executor is not None and len(payload) >= OFFLOAD_THRESHOLD_BYTES
+
+
+# Run fn(payload, *args) inline for small payloads, or in the pool for large ones.
+# fn must be a module-level function so it can be pickled for a process pool;
+# payload is the raw response body, so only bytes cross the process boundary.
+async def run_transform(fn, payload: bytes, *args):
+    if not should_offload(payload):
+        with timed(observe_transform, fn.__name__, "inline"):
+            return fn(payload, *args)
+    logger.debug("[Offload] %s on %d bytes", fn.__name__, len(payload))
+    with timed(observe_transform, fn.__name__, "pool"):
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, payload, *args)
@@ -0,0 +1,76 @@
+# backend/pagination.py
+
+import time
+import asyncio
+from typing import Any, NamedTuple
+from logger import logger
+
+
+class Page(NamedTuple):
+    data: Any
+    number: int  # 1-based
+    fetch_seconds: float
+    parse_seconds: float
+    size: int  # response body bytes
+
+
+async def _iter_pages(fetch, parse, provider, max_pages):
+    cursor = None
+    number = 0
+    while True:
+        started = time.perf_counter()
+        content = await fetch(cursor)
+        fetched = time.perf_counter()
+        data, cursor = await parse(content)
+        number += 1
+        page = Page(data, number, fetched - started, time.perf_counter() - fetched, len(content))
+        logger.debug(
+            "[%s] Page %d: %d bytes, fetch %.3fs, parse %.3fs",
+            provider, number, page.size, page.fetch_seconds, page.parse_seconds,
+        )
+        yield page
+
+        if not cursor:
+            return
+        if max_pages and number >= max_pages:
+            logger.warning(f"[{provider}] Stopping pagination at {number} pages (limit reached)")
+            return
+
+
+# Iterate a cursor-paginated API one page at a time.
+#   fetch(cursor) -> response bytes; cursor is None for the first page
+#   parse(content) -> (data, next_cursor); a falsy cursor ends the crawl
+# Each page is parsed once and yielded as a Page with its timings. With prefetch > 0
+# a background task keeps fetching and parsing up to that many pages ahead of the
+# consumer; upstream errors are re-raised to the consumer in page order.
+async def paginate(fetch, parse, *, provider, max_pages=None, prefetch=0):
+    pages = _iter_pages(fetch, parse, provider, max_pages)
+    if prefetch <= 0:
+        try:
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
+        return
+
+    queue = asyncio.Queue(maxsize=prefetch)
+
+    async def produce():
+        try:
+            async for page in pages:
+                await queue.put(page)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is None:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        producer.cancel()
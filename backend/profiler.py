@@ -0,0 +1,141 @@
+# backend/profiler.py
+
+import os
+import sys
+import time
+import asyncio
+import secrets
+import threading
+from collections import Counter, OrderedDict
+from fastapi import HTTPException
+import admin
+from logger import logger
+
+# On-demand sampling profiler for a live worker. Off unless PROFILING_ENABLED is set,
+# and reachable only through admin-token routes/headers. A background thread samples
+# the event loop thread's stack every PROFILE_INTERVAL seconds; output is collapsed
+# stacks ("outer;...;inner count" per line), the input format of flamegraph.pl and
+# speedscope.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 60))
+# Per-request profiles kept for retrieval
+PROFILE_KEEP = 20
+
+PROFILE_HEADER = "x-profile"
+
+# One sampler at a time per worker keeps the overhead bounded
+_busy = threading.Lock()
+_request_profiles: OrderedDict[str, str] = OrderedDict()
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[_collapse(frame)] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stopped.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+# Profile the event loop thread for `seconds` and return the collapsed stacks
+async def profile_for(seconds) -> str:
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    seconds = min(max(float(seconds), PROFILE_INTERVAL), PROFILE_MAX_SECONDS)
+    if not _busy.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running.")
+    try:
+        sampler = Sampler(threading.get_ident())
+        logger.info(f"[Profiler] Sampling for {seconds}s")
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            collapsed = sampler.stop()
+        logger.info(f"[Profiler] Collected {sampler.samples} samples")
+        return collapsed
+    finally:
+        _busy.release()
+
+
+def get_request_profile(profile_id) -> str:
+    collapsed = _request_profiles.get(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return collapsed
+
+
+def _wants_profile(scope):
+    if not PROFILING_ENABLED or not admin.ADMIN_TOKEN:
+        return False
+    headers = dict(scope["headers"])
+    if headers.get(PROFILE_HEADER.encode()) is None:
+        return False
+    token = headers.get(b"x-admin-token", b"").decode()
+    return secrets.compare_digest(token, admin.ADMIN_TOKEN)
+
+
+# ASGI middleware: a request sent with 'X-Profile: 1' (and the admin token) is
+# sampled from start to end of its response. The profile id comes back in the
+# X-Profile-Id header; fetch the stacks from /admin/profile/requests/{id}.
+# The loop is shared, so concurrent requests show up in the profile too.
+class ProfileRequestMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            return await self.app(scope, receive, send)
+        if not _busy.acquire(blocking=False):
+            logger.info("[Profiler] Busy, not profiling request")
+            return await self.app(scope, receive, send)
+
+        profile_id = secrets.token_hex(8)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = Sampler(threading.get_ident())
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_profiles[profile_id] = sampler.stop()
+            _busy.release()
+            while len(_request_profiles) > PROFILE_KEEP:
+                _request_profiles.popitem(last=False)
+            logger.info(
+                f"[Profiler] Profiled {scope['method']} {scope['path']} "
+                f"({sampler.samples} samples, {time.perf_counter() - started:.3f}s) as {profile_id}"
+            )
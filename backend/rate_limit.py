@@ -0,0 +1,155 @@
+# backend/rate_limit.py
+
+import os
+import time
+import random
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple
+import httpx
+import redis_client
+from metrics import observe_upstream, span
+from logger import logger
+
+# 'redis' shares buckets across workers; 'local' keeps them per process
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "redis").lower()
+# After a Redis failure, use local buckets for this long before trying Redis again
+RATE_LIMIT_REDIS_RETRY_AFTER = 30
+
+# Retries for 429 / 5xx / transport errors
+RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 4))
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", 30))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimit(NamedTuple):
+    rate: float  # sustained requests per second
+    burst: int  # bucket capacity
+
+
+# Token bucket with reservation: always takes a token (the balance may go negative)
+# and returns how many ms the caller must wait before sending. Uses Redis TIME so
+# every worker shares one clock.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+if tokens >= 0 then
+    return 0
+end
+return math.ceil(-tokens * 1000 / rate)
+"""
+
+_token_bucket = None
+_redis_unavailable_until = 0.0
+
+# Per-process buckets: key -> (tokens, last refill time)
+_local_buckets: dict[str, tuple[float, float]] = {}
+
+
+def limit_scope(access_token):
+    # Bucket keys never contain the raw token
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
+
+
+def _reserve_local(key, limit: RateLimit):
+    now = time.monotonic()
+    tokens, ts = _local_buckets.get(key, (limit.burst, now))
+    tokens = min(limit.burst, tokens + (now - ts) * limit.rate) - 1
+    _local_buckets[key] = (tokens, now)
+    return 0.0 if tokens >= 0 else -tokens / limit.rate
+
+
+async def _reserve(key, limit: RateLimit):
+    global _token_bucket, _redis_unavailable_until
+    if RATE_LIMIT_BACKEND != "redis" or time.monotonic() < _redis_unavailable_until:
+        return _reserve_local(key, limit)
+    try:
+        if _token_bucket is None:
+            _token_bucket = redis_client.redis_client.register_script(_TOKEN_BUCKET_SCRIPT)
+        return int(await _token_bucket(keys=[key], args=[limit.rate, limit.burst])) / 1000
+    except Exception:
+        logger.warning(
+            f"[RateLimit] Redis unavailable, using local buckets for {RATE_LIMIT_REDIS_RETRY_AFTER}s"
+        )
+        _redis_unavailable_until = time.monotonic() + RATE_LIMIT_REDIS_RETRY_AFTER
+        return _reserve_local(key, limit)
+
+
+# Wait until the (provider, scope) bucket allows another request
+async def acquire(provider, scope, limit: RateLimit):
+    wait = await _reserve(f"ratelimit:{provider}:{scope}", limit)
+    if wait > 0:
+        logger.debug("[RateLimit] %s throttled for %.2fs", provider, wait)
+        await asyncio.sleep(wait)
+
+
+# Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _backoff(attempt):
+    # Full jitter: uniform over [0, base * 2^attempt], capped
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+# Send a request through the provider's rate limiter, retrying 429/5xx responses and
+# transport errors with jittered exponential backoff (Retry-After wins when present).
+# Returns the last response; callers still check its status. `endpoint` labels the
+# latency metric and defaults to the URL path (pass a template for paths with ids).
+# `extra_limits` are further (scope, limit) buckets every attempt must also pass,
+# e.g. a per-token limit on top of a per-resource one.
+async def send_with_retry(
+    client: httpx.AsyncClient, method, url, *, provider, scope, limit: RateLimit,
+    endpoint=None, extra_limits=(), **kwargs
+) -> httpx.Response:
+    endpoint = endpoint or httpx.URL(url).path
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        await acquire(provider, scope, limit)
+        for extra_scope, extra_limit in extra_limits:
+            await acquire(provider, extra_scope, extra_limit)
+        last_attempt = attempt == RETRY_MAX_ATTEMPTS - 1
+        started = time.perf_counter()
+        try:
+            with span("upstream", provider=provider, endpoint=endpoint, attempt=attempt):
+                response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            observe_upstream(provider, endpoint, "error", time.perf_counter() - started)
+            if last_attempt:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"[RateLimit] {provider} {type(e).__name__}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        observe_upstream(provider, endpoint, response.status_code, time.perf_counter() - started)
+        if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+            return response
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        delay = min(retry_after, RETRY_MAX_DELAY) if retry_after is not None else _backoff(attempt)
+        logger.warning(
+            f"[RateLimit] {provider} returned {response.status_code}, retrying in {delay:.2f}s "
+            f"(attempt {attempt + 1}/{RETRY_MAX_ATTEMPTS})"
+        )
+        await asyncio.sleep(delay)
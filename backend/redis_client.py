@@ -1,25 +1,157 @@
 # backend/redis_client.py
 
 import os
+import secrets
+import time
+import zlib
+from contextlib import asynccontextmanager
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 from kombu.utils.url import safequote
+from metrics import observe_redis
 from logger import logger
 
+# zstd is optional: pip install zstandard
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
 # Get and encode host safely
 redis_host = safequote(os.environ.get('REDIS_HOST', 'localhost'))
 redis_port = int(os.environ.get('REDIS_PORT', 6379))
 redis_db = int(os.environ.get('REDIS_DB', 0))
 
+# Connection pool tuning; callers wait up to REDIS_POOL_TIMEOUT for a free connection
+# instead of failing when a burst exhausts the pool
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 5))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+# Value compression: 'zlib', 'zstd' or 'none'; values below the threshold are stored as-is
+REDIS_COMPRESSION = os.environ.get('REDIS_COMPRESSION', 'zlib').lower()
+REDIS_COMPRESSION_MIN_BYTES = int(os.environ.get('REDIS_COMPRESSION_MIN_BYTES', 1024))
+REDIS_COMPRESSION_LEVEL = int(os.environ.get('REDIS_COMPRESSION_LEVEL', 1))
+
+# Format marker bytes. Entries written before compression existed have no marker
+# (they start with JSON or URL-safe text), so they still read back unchanged.
+_RAW_MARKER = b"\x00"
+_ZLIB_MARKER = b"\x01"
+_ZSTD_MARKER = b"\x02"
+
+if REDIS_COMPRESSION == 'zstd' and zstandard is None:
+    logger.warning("[Redis] REDIS_COMPRESSION=zstd but 'zstandard' is not installed, using zlib")
+    REDIS_COMPRESSION = 'zlib'
+
+# Running totals for compression ratio and encode/decode time
+compression_stats = {
+    "compressed_values": 0,
+    "raw_bytes": 0,
+    "compressed_bytes": 0,
+    "encode_seconds": 0.0,
+    "decompressed_values": 0,
+    "decode_seconds": 0.0,
+}
+
 # Create Redis client
-redis_client = redis.Redis(host=redis_host, port=redis_port, db=redis_db)
+redis_pool = redis.BlockingConnectionPool(
+    host=redis_host,
+    port=redis_port,
+    db=redis_db,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+
+# Every command (and every pipeline round trip) is timed into the Redis latency histogram
+class _TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error=True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            observe_redis("PIPELINE", time.perf_counter() - started)
+
+
+class _TimedRedis(redis.Redis):
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            observe_redis(str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_client = _TimedRedis(connection_pool=redis_pool)
+
+
+def get_compression_stats():
+    stats = dict(compression_stats)
+    stats["ratio"] = (
+        stats["raw_bytes"] / stats["compressed_bytes"] if stats["compressed_bytes"] else None
+    )
+    return stats
+
+
+# Compress values above the threshold and prefix them with a format marker
+def _encode_value(value):
+    if isinstance(value, str):
+        value = value.encode()
+    if not isinstance(value, bytes):
+        return value
+
+    if REDIS_COMPRESSION == 'none' or len(value) < REDIS_COMPRESSION_MIN_BYTES:
+        # Escape raw values that would otherwise look like a marker
+        if value[:1] in (_RAW_MARKER, _ZLIB_MARKER, _ZSTD_MARKER):
+            return _RAW_MARKER + value
+        return value
+
+    start = time.perf_counter()
+    if REDIS_COMPRESSION == 'zstd':
+        encoded = _ZSTD_MARKER + zstandard.ZstdCompressor(level=REDIS_COMPRESSION_LEVEL).compress(value)
+    else:
+        encoded = _ZLIB_MARKER + zlib.compress(value, REDIS_COMPRESSION_LEVEL)
+    compression_stats["encode_seconds"] += time.perf_counter() - start
+    compression_stats["compressed_values"] += 1
+    compression_stats["raw_bytes"] += len(value)
+    compression_stats["compressed_bytes"] += len(encoded)
+    return encoded
+
+
+# Reverse _encode_value; unmarked values are returned unchanged
+def _decode_value(value):
+    if not value:
+        return value
+    marker = value[:1]
+    if marker == _RAW_MARKER:
+        return value[1:]
+    if marker not in (_ZLIB_MARKER, _ZSTD_MARKER):
+        return value
 
-# Add value to Redis with optional expiration
+    start = time.perf_counter()
+    if marker == _ZSTD_MARKER:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed value found but 'zstandard' is not installed")
+        decoded = zstandard.ZstdDecompressor().decompress(value[1:])
+    else:
+        decoded = zlib.decompress(value[1:])
+    compression_stats["decode_seconds"] += time.perf_counter() - start
+    compression_stats["decompressed_values"] += 1
+    return decoded
+
+# Add value to Redis with optional expiration (atomic SET ... EX)
 async def add_key_value_redis(key, value, expire=None):
     try:
-        await redis_client.set(key, value)
-        if expire:
-            await redis_client.expire(key, expire)
-        logger.debug(f"[Redis] SET {key} (expire={expire})")
+        await redis_client.set(key, _encode_value(value), ex=expire or None)
+        logger.debug("[Redis] SET %s (expire=%s)", key, expire)
     except Exception as e:
         logger.exception(f"[Redis] Failed to SET key '{key}'")
 
@@ -27,16 +159,134 @@ async def add_key_value_redis(key, value, expire=None):
 async def get_value_redis(key):
     try:
         value = await redis_client.get(key)
-        logger.debug(f"[Redis] GET {key} -> {'HIT' if value else 'MISS'}")
-        return value
+        logger.debug("[Redis] GET %s -> %s", key, "HIT" if value else "MISS")
+        return _decode_value(value)
     except Exception as e:
         logger.exception(f"[Redis] Failed to GET key '{key}'")
         return None
 
-# Delete a key from Redis
-async def delete_key_redis(key):
+# Get and delete a value in one atomic round trip (GETDEL)
+async def pop_value_redis(key):
+    try:
+        value = await redis_client.getdel(key)
+        logger.debug("[Redis] GETDEL %s -> %s", key, "HIT" if value else "MISS")
+        return _decode_value(value)
+    except Exception:
+        logger.exception(f"[Redis] Failed to GETDEL key '{key}'")
+        return None
+
+# Get and delete several values in one pipelined round trip
+async def mpop_redis(*keys):
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.getdel(key)
+            values = await pipe.execute()
+        logger.debug("[Redis] GETDEL %s", keys)
+        return [_decode_value(value) for value in values]
+    except Exception:
+        logger.exception(f"[Redis] Failed to GETDEL keys {keys}")
+        return [None] * len(keys)
+
+# Get several values in one round trip; missing keys come back as None
+async def mget_redis(*keys):
     try:
-        await redis_client.delete(key)
-        logger.debug(f"[Redis] DEL {key}")
+        values = await redis_client.mget(keys)
+        logger.debug("[Redis] MGET %s", keys)
+        return [_decode_value(value) for value in values]
+    except Exception:
+        logger.exception(f"[Redis] Failed to MGET keys {keys}")
+        return [None] * len(keys)
+
+# Set several values with the same expiration in one pipelined round trip
+async def mset_redis(mapping, expire=None):
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, _encode_value(value), ex=expire or None)
+            await pipe.execute()
+        logger.debug("[Redis] MSET %s (expire=%s)", list(mapping), expire)
+    except Exception:
+        logger.exception(f"[Redis] Failed to MSET keys {list(mapping)}")
+
+# Batch arbitrary commands into one round trip:
+#     async with redis_pipeline() as pipe:
+#         pipe.incr(key)
+#         pipe.expire(key, 60)
+# Values written this way bypass compression.
+@asynccontextmanager
+async def redis_pipeline(transaction=False):
+    async with redis_client.pipeline(transaction=transaction) as pipe:
+        yield pipe
+        await pipe.execute()
+
+# Get a value and its remaining TTL (seconds, None if no expiry) in one round trip
+async def get_value_with_ttl_redis(key):
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            value, ttl_ms = await pipe.get(key).pttl(key).execute()
+        logger.debug("[Redis] GET+PTTL %s -> %s", key, "HIT" if value else "MISS")
+        return _decode_value(value), (ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else None)
+    except Exception:
+        logger.exception(f"[Redis] Failed to GET key '{key}'")
+        return None, None
+
+# Publish a message on a pub/sub channel
+async def publish_redis(channel, message):
+    try:
+        await redis_client.publish(channel, message)
+        logger.debug("[Redis] PUBLISH %s", channel)
+    except Exception:
+        logger.exception(f"[Redis] Failed to PUBLISH on '{channel}'")
+
+# Delete one or more keys from Redis in a single command
+async def delete_key_redis(*keys):
+    try:
+        await redis_client.delete(*keys)
+        logger.debug("[Redis] DEL %s", keys)
     except Exception as e:
-        logger.exception(f"[Redis] Failed to DEL key '{key}'")
+        logger.exception(f"[Redis] Failed to DEL keys {keys}")
+
+# Take a short-lived lock (SET NX PX). Returns the owner token, or None if another
+# worker holds it. Fails open: if Redis is unreachable the caller proceeds unlocked.
+async def acquire_lock_redis(key, ttl_ms):
+    token = secrets.token_hex(8)
+    try:
+        acquired = await redis_client.set(key, token, nx=True, px=ttl_ms)
+        logger.debug("[Redis] LOCK %s -> %s", key, "ACQUIRED" if acquired else "HELD")
+        return token if acquired else None
+    except Exception:
+        logger.exception(f"[Redis] Failed to LOCK key '{key}'")
+        return token
+
+# Release a lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+async def release_lock_redis(key, token):
+    try:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, key, token)
+        logger.debug("[Redis] UNLOCK %s", key)
+    except Exception:
+        logger.exception(f"[Redis] Failed to UNLOCK key '{key}'")
+
+# Push a held lock's expiry out again; False once another owner has it (or it expired)
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+async def extend_lock_redis(key, token, ttl_ms):
+    try:
+        extended = await redis_client.eval(_EXTEND_LOCK_SCRIPT, 1, key, token, ttl_ms)
+        logger.debug("[Redis] EXTEND %s -> %s", key, "OK" if extended else "LOST")
+        return bool(extended)
+    except Exception:
+        logger.exception(f"[Redis] Failed to EXTEND lock '{key}'")
+        return False
@@ -0,0 +1,43 @@
+# backend/serializer.py
+
+import json
+from datetime import date, datetime
+from fastapi.responses import JSONResponse, Response
+
+# orjson is optional: several times faster than stdlib json when installed
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Encode to compact JSON bytes
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+    def loads(data):
+        return json.loads(data)
+
+
+# JSONResponse that encodes with the fastest available serializer
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# Response for bytes that are already JSON (e.g. Redis cache hits): sent as-is
+class RawJSONResponse(Response):
+    media_type = "application/json"
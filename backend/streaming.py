@@ -0,0 +1,62 @@
+# backend/streaming.py
+
+import os
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from cache import get_items_entry, store_items
+from serializer import dumps, loads
+from logger import logger
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Streams larger than this are sent to the client but not written to the cache,
+# so memory stays flat for huge workspaces
+STREAM_CACHE_MAX_ITEMS = int(os.environ.get("STREAM_CACHE_MAX_ITEMS", 50000))
+
+
+# Clients opt into streaming with 'Accept: application/x-ndjson'
+def wants_ndjson(request: Request):
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+# Serve item pages from the cache, or pass fetched pages through while caching them.
+# Stale entries are re-fetched, since streaming already hides the upstream latency.
+async def stream_cached_pages(redis_key, pages, expire=300, soft_ttl=None):
+    cached, stale = await get_items_entry(redis_key, expire, soft_ttl)
+    if cached and not stale:
+        yield loads(cached)
+        return
+
+    collected = []
+    async for page in pages:
+        if collected is not None:
+            collected.extend(page)
+            if len(collected) > STREAM_CACHE_MAX_ITEMS:
+                logger.info(f"[Stream] {redis_key} exceeds {STREAM_CACHE_MAX_ITEMS} items, not caching")
+                collected = None
+        yield page
+
+    if collected is not None:
+        await store_items(redis_key, dumps(collected), expire=expire, soft_ttl=soft_ttl)
+
+
+# Encode item pages as one JSON object per line, ending with a summary line
+async def _ndjson_lines(pages, provider):
+    count = 0
+    page_count = 0
+    try:
+        async for page in pages:
+            page_count += 1
+            count += len(page)
+            yield b"".join(dumps(item) + b"\n" for item in page)
+    except Exception:
+        # Headers are already sent, so report the failure in-band
+        logger.exception(f"[Stream] {provider} stream failed after {count} items")
+        yield dumps({"error": f"{provider} data fetch failed.", "items": count}) + b"\n"
+        return
+    logger.info(f"[Stream] Streamed {count} {provider} items in {page_count} pages")
+    yield dumps({"summary": {"provider": provider, "items": count, "pages": page_count}}) + b"\n"
+
+
+def ndjson_response(pages, provider) -> StreamingResponse:
+    return StreamingResponse(_ndjson_lines(pages, provider), media_type=NDJSON_MEDIA_TYPE)
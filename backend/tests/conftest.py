@@ -0,0 +1,10 @@
+import pytest
+import rate_limit
+
+
+# Keep upstream-facing tests off Redis and free of real backoff sleeps
+@pytest.fixture(autouse=True)
+def fast_rate_limit(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKEND", "local")
+    monkeypatch.setattr(rate_limit, "RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(rate_limit, "_local_buckets", {})
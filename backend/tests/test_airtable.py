@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+import cache
+import rate_limit
+from integrations import airtable
+from integrations.airtable import fetch_base_tables, fetch_bases
+
+
+@pytest.mark.asyncio
+async def test_fetch_bases_follows_offset():
+    def handler(request):
+        if request.url.params.get("offset") == "page2":
+            return httpx.Response(200, json={"bases": [{"id": "b2"}]})
+        return httpx.Response(200, json={"bases": [{"id": "b1"}], "offset": "page2"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        bases = await fetch_bases(client, "token")
+    assert [b["id"] for b in bases] == ["b1", "b2"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_bases_raises_instead_of_returning_partial_list():
+    def handler(request):
+        if request.url.params.get("offset") == "page2":
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200, json={"bases": [{"id": "b1"}], "offset": "page2"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(HTTPException):
+            await fetch_bases(client, "token")
+
+
+@pytest.mark.asyncio
+async def test_fetch_base_tables_keeps_order_and_skips_inaccessible_bases():
+    def handler(request):
+        base_id = request.url.path.split("/")[-2]
+        if base_id == "gone":
+            return httpx.Response(403, text="forbidden")
+        return httpx.Response(200, json={"tables": [{"id": f"{base_id}_t"}]})
+
+    semaphore = asyncio.Semaphore(2)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        results = await asyncio.gather(
+            *[
+                fetch_base_tables(client, "token", {"id": base_id}, semaphore)
+                for base_id in ["a", "gone", "c"]
+            ]
+        )
+    assert results == [[{"id": "a_t"}], [], [{"id": "c_t"}]]
+
+
+@pytest.mark.asyncio
+async def test_fetch_base_tables_raises_when_retries_run_out():
+    handler = lambda request: httpx.Response(503, text="busy")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(HTTPException) as exc:
+            await fetch_base_tables(client, "token", {"id": "a"}, asyncio.Semaphore(1))
+    assert exc.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_table_requests_pass_the_base_and_token_limits(monkeypatch):
+    acquired = []
+
+    async def acquire(provider, scope, limit):
+        acquired.append((scope, limit))
+
+    monkeypatch.setattr(rate_limit, "acquire", acquire)
+    handler = lambda request: httpx.Response(200, json={"tables": []})
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await fetch_base_tables(client, "token", {"id": "app1"}, asyncio.Semaphore(1))
+    assert acquired == [
+        ("app1", airtable.BASE_RATE_LIMIT),
+        (rate_limit.limit_scope("token"), airtable.TOKEN_RATE_LIMIT),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_load_reports_a_crawl_in_progress_as_503(monkeypatch):
+    async def still_fetching(*args, **kwargs):
+        raise cache.FetchInProgress()
+
+    monkeypatch.setattr(airtable, "get_cached_items", still_fetching)
+    with pytest.raises(HTTPException) as exc:
+        await airtable.get_items_airtable('{"access_token": "t"}', raw=True)
+    assert exc.value.status_code == 503
@@ -0,0 +1,232 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+import cache
+from serializer import loads
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    store = {}
+
+    async def get_value(key):
+        return store.get(key)
+
+    async def get_value_with_ttl(key):
+        return store.get(key), None
+
+    async def add_value(key, value, expire=None):
+        store[key] = value
+
+    async def publish(channel, message):
+        pass
+
+    async def acquire_lock(key, ttl_ms):
+        if key in store:
+            return None
+        store[key] = b"token"
+        return "token"
+
+    async def release_lock(key, token):
+        store.pop(key, None)
+
+    async def extend_lock(key, token, ttl_ms):
+        store.setdefault("extended", []).append(key)
+        return key in store
+
+    monkeypatch.setattr(cache, "get_value_redis", get_value)
+    monkeypatch.setattr(cache, "get_value_with_ttl_redis", get_value_with_ttl)
+    monkeypatch.setattr(cache, "add_key_value_redis", add_value)
+    monkeypatch.setattr(cache, "publish_redis", publish)
+    monkeypatch.setattr(cache, "local_cache", cache.LocalLRUCache(1024, 30))
+    monkeypatch.setattr(cache, "acquire_lock_redis", acquire_lock)
+    monkeypatch.setattr(cache, "release_lock_redis", release_lock)
+    monkeypatch.setattr(cache, "extend_lock_redis", extend_lock)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_fetch_once(fake_redis):
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return [{"id": "1"}]
+
+    results = await asyncio.gather(
+        *[cache.get_cached_items("items:k", fetch, "Test") for _ in range(5)]
+    )
+    assert calls == 1
+    assert all(loads(result) == [{"id": "1"}] for result in results)
+    assert "items:k:lock" not in fake_redis
+
+    await cache.get_cached_items("items:k", fetch, "Test")
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_followers_see_leader_failure_and_next_call_retries(fake_redis):
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        *[cache.get_cached_items("items:k", failing, "Test") for _ in range(3)],
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_waits_for_leader_in_another_worker(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_POLL_INTERVAL", 0.01)
+    fake_redis["items:k:lock"] = b"other-worker"
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.03)
+        fake_redis["items:k"] = b'[{"id":"2"}]'
+
+    async def fetch():
+        raise AssertionError("follower must not fetch")
+
+    _, result = await asyncio.gather(
+        other_worker_finishes(), cache.get_cached_items("items:k", fetch, "Test")
+    )
+    assert result == b'[{"id":"2"}]'
+
+
+@pytest.mark.asyncio
+async def test_leader_renews_its_lock_during_long_fetches(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_LOCK_TTL", 0.03)
+
+    async def slow_fetch():
+        await asyncio.sleep(0.05)
+        return [{"id": "1"}]
+
+    await cache.get_cached_items("items:k", slow_fetch, "Test")
+    assert fake_redis["extended"] == ["items:k:lock"] * len(fake_redis["extended"])
+    assert len(fake_redis["extended"]) >= 2
+    assert "items:k:lock" not in fake_redis
+
+
+@pytest.mark.asyncio
+async def test_followers_never_crawl_while_the_lock_is_held(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_WAIT", 0.05)
+    fake_redis["items:k:lock"] = b"other-worker"
+
+    async def fetch():
+        raise AssertionError("follower must not fetch")
+
+    with pytest.raises(HTTPException) as exc:
+        await cache.get_cached_items("items:k", fetch, "Test")
+    assert exc.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_the_leader_gives_up(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_POLL_INTERVAL", 0.01)
+    fake_redis["items:k:lock"] = b"other-worker"
+
+    async def leader_fails():
+        await asyncio.sleep(0.03)
+        fake_redis.pop("items:k:lock")
+
+    async def fetch():
+        return [{"id": "3"}]
+
+    _, result = await asyncio.gather(leader_fails(), cache.get_cached_items("items:k", fetch, "Test"))
+    assert loads(result) == [{"id": "3"}]
+
+
+def test_local_cache_evicts_by_bytes_and_expires(monkeypatch):
+    local = cache.LocalLRUCache(max_bytes=10, ttl=30)
+    local.set("a", b"12345")
+    local.set("b", b"12345")
+    local.get("a")
+    local.set("c", b"123")
+    assert local.get("b") is None
+    assert local.get("a") == b"12345" and local.get("c") == b"123"
+    assert local.size == 8
+
+    local.set("huge", b"x" * 11)
+    assert local.get("huge") is None
+
+    clock = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: clock[0])
+    local.set("short", b"1", ttl=1)
+    clock[0] = 2.0
+    assert local.get("short") is None
+
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_repeat_reads(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "cache_stats", dict.fromkeys(cache.cache_stats, 0))
+    fake_redis["items:k"] = b'[{"id":"1"}]'
+
+    assert await cache.get_items_entry("items:k") == (b'[{"id":"1"}]', False)
+    del fake_redis["items:k"]
+    assert await cache.get_items_entry("items:k") == (b'[{"id":"1"}]', False)
+
+    stats = cache.get_cache_stats()
+    assert (stats["local_hits"], stats["local_misses"], stats["redis_hits"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_served_while_refreshing(fake_redis, monkeypatch):
+    fresh = [{"id": "new"}]
+
+    async def get_value_with_ttl(key):
+        # Written 400s ago with a 900s hard TTL
+        return fake_redis.get(key), 500.0 if key == "items:k" else None
+
+    monkeypatch.setattr(cache, "get_value_with_ttl_redis", get_value_with_ttl)
+    fake_redis["items:k"] = b'[{"id":"old"}]'
+    refreshed = asyncio.Event()
+
+    async def fetch():
+        refreshed.set()
+        return fresh
+
+    result = await cache.get_cached_items("items:k", fetch, "Test", expire=900, soft_ttl=300)
+    assert result == b'[{"id":"old"}]'
+
+    await asyncio.wait_for(refreshed.wait(), 1)
+    while cache._inflight:
+        await asyncio.sleep(0)
+    assert loads(fake_redis["items:k"]) == fresh
+    assert await cache.get_cached_items("items:k", fetch, "Test", expire=900, soft_ttl=300) == fake_redis["items:k"]
+
+
+@pytest.mark.asyncio
+async def test_miss_does_not_join_a_background_refresh(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "SINGLE_FLIGHT_POLL_INTERVAL", 0.01)
+
+    async def get_value_with_ttl(key):
+        return fake_redis.get(key), 500.0 if key in fake_redis else None
+
+    monkeypatch.setattr(cache, "get_value_with_ttl_redis", get_value_with_ttl)
+    fake_redis["items:k"] = b'[{"id":"old"}]'
+    # Another worker holds the lock, so the background refresh returns None
+    fake_redis["items:k:lock"] = b"other-worker"
+    never = asyncio.Event()
+
+    async def fetch():
+        await never.wait()
+
+    assert await cache.get_cached_items("items:k", fetch, "Test", expire=900, soft_ttl=300)
+    # Hard-expired while the refresh is still registered
+    del fake_redis["items:k"]
+    cache.local_cache.clear()
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.03)
+        fake_redis["items:k"] = b'[{"id":"new"}]'
+
+    _, result = await asyncio.gather(
+        other_worker_finishes(), cache.get_cached_items("items:k", fetch, "Test", expire=900, soft_ttl=300)
+    )
+    assert result == b'[{"id":"new"}]'
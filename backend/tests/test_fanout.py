@@ -0,0 +1,62 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import fanout
+from main import app
+from serializer import RawJSONResponse, dumps
+
+
+def _loader(delay=0.0, items=None, error=None):
+    async def load(credentials, raw=False):
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return RawJSONResponse(dumps(items or [{"id": credentials}]))
+    return load
+
+
+@pytest.fixture
+def loaders(monkeypatch):
+    fakes = {
+        "airtable": _loader(delay=0.05),
+        "notion": _loader(error=HTTPException(status_code=500, detail="Notion data fetch failed.")),
+        "hubspot": _loader(delay=1),
+    }
+    monkeypatch.setattr(fanout, "LOADERS", fakes)
+    monkeypatch.setitem(fanout.LOAD_TIMEOUTS, "hubspot", 0.1)
+    return fakes
+
+
+@pytest.mark.asyncio
+async def test_load_all_reports_each_provider(loaders):
+    started = asyncio.get_running_loop().time()
+    response = await fanout.load_all({"airtable": "a", "notion": "n", "hubspot": "h"})
+    elapsed = asyncio.get_running_loop().time() - started
+
+    results = json.loads(response.body)["results"]
+    assert [r["provider"] for r in results] == ["airtable", "notion", "hubspot"]
+    assert results[0]["status"] == "ok" and results[0]["items"] == [{"id": "a"}]
+    assert results[1]["status"] == "error" and results[1]["status_code"] == 500
+    assert results[2]["status"] == "error" and results[2]["status_code"] == 504
+    # Concurrent: bounded by the slowest provider (the hubspot timeout), not the sum
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_result_lines_arrive_in_completion_order(loaders):
+    lines = [
+        json.loads(line)
+        async for line in fanout._result_lines({"airtable": "a", "notion": "n", "hubspot": "h"})
+    ]
+    assert [line["provider"] for line in lines] == ["notion", "airtable", "hubspot"]
+
+
+def test_load_endpoint_requires_credentials():
+    client = TestClient(app)
+    assert client.post("/integrations/load", data={}).status_code == 400
+    # Client-supplied ids are not an identity: stored tokens are never served from them
+    identity = {"user_id": "user", "org_id": "org"}
+    assert client.post("/integrations/load", data=identity).status_code == 400
+    assert client.post("/integrations/airtable/load", data=identity).status_code == 422
@@ -0,0 +1,15 @@
+import pytest
+from http_client import close_http_clients, get_http_client, init_http_clients
+
+
+@pytest.mark.asyncio
+async def test_clients_are_shared_per_provider_and_closed():
+    await init_http_clients()
+    client = get_http_client("notion")
+    assert get_http_client("notion") is client
+    assert get_http_client("hubspot") is not client
+
+    await close_http_clients()
+    assert client.is_closed
+    assert get_http_client("notion") is not client
+    await close_http_clients()
@@ -0,0 +1,37 @@
+import httpx
+import pytest
+import http_client
+from integrations import hubspot
+
+
+def _contact(n):
+    return {"id": str(n), "properties": {"firstname": f"C{n}", "email": f"c{n}@example.com"}}
+
+
+@pytest.fixture
+def hubspot_upstream(monkeypatch):
+    # Three pages of two contacts each, chained through paging.next.after
+    def handler(request):
+        after = int(request.url.params.get("after", 0))
+        body = {"results": [_contact(after), _contact(after + 1)]}
+        if after < 4:
+            body["paging"] = {"next": {"after": str(after + 2)}}
+        return httpx.Response(200, json=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client._clients, "hubspot", client)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_iter_contact_pages_follows_cursor(hubspot_upstream):
+    pages = [page async for page in hubspot.iter_contact_pages("token")]
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert [item["id"] for page in pages for item in page] == ["0", "1", "2", "3", "4", "5"]
+
+
+@pytest.mark.asyncio
+async def test_iter_contact_pages_respects_item_cap(hubspot_upstream, monkeypatch):
+    monkeypatch.setattr(hubspot, "MAX_ITEMS", 3)
+    pages = [page async for page in hubspot.iter_contact_pages("token")]
+    assert sum(len(page) for page in pages) == 3
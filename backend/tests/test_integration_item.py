@@ -1,4 +1,4 @@
-from integrations.integration_item import IntegrationItem
+from integrations.integration_item import IntegrationItem, to_clean_dicts
 
 def test_clean_dict_drops_defaults():
     item = IntegrationItem(
@@ -13,3 +13,20 @@ def test_clean_dict_drops_defaults():
     assert "directory" not in result
     assert "visibility" not in result
     assert result["email"] == "test@example.com"
+
+def test_clean_dict_keeps_non_default_flags_and_drops_none():
+    item = IntegrationItem(id="1", directory=True, visibility=False, children=[])
+    assert item.to_clean_dict() == {
+        "id": "1",
+        "directory": True,
+        "children": [],
+        "visibility": False,
+    }
+
+def test_items_are_slotted():
+    item = IntegrationItem(id="1")
+    assert not hasattr(item, "__dict__")
+
+def test_to_clean_dicts_skips_none_items():
+    items = [IntegrationItem(id="1"), None, IntegrationItem(id="2", name="Two")]
+    assert to_clean_dicts(items) == [{"id": "1"}, {"id": "2", "name": "Two"}]
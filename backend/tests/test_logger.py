@@ -0,0 +1,61 @@
+import json
+import logging
+import queue
+from fastapi.testclient import TestClient
+import admin
+import logger as logger_module
+from main import app
+
+
+def _record(msg, level=logging.DEBUG, args=()):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_filter_only_thins_listed_debug_categories(monkeypatch):
+    sampler = logger_module.DebugSamplingFilter(("[Redis]",), rate=0.0)
+    assert not sampler.filter(_record("[Redis] GET %s", args=("k",)))
+    assert sampler.filter(_record("[Redis] failed", level=logging.ERROR))
+    assert sampler.filter(_record("[Notion] page %d", args=(1,)))
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    handler = logger_module.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    record = _record("[Cache] %s", args=({"big": "payload"},))
+    handler.emit(record)
+    # Queued untouched: the message is still the template, formatted by the listener
+    assert handler.queue.get_nowait().msg == "[Cache] %s"
+
+    dropped = logger_module.NonBlockingQueueHandler.dropped
+    handler.emit(_record("one"))
+    handler.emit(_record("two"))
+    assert logger_module.NonBlockingQueueHandler.dropped == dropped + 1
+
+
+def test_json_formatter():
+    line = logger_module.JsonFormatter().format(_record("hello %s", level=logging.INFO, args=("world",)))
+    entry = json.loads(line)
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+
+
+def test_log_level_endpoint_requires_admin_token(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    assert client.get("/admin/log-level").status_code == 404
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/log-level").status_code == 403
+
+    previous = logger_module.get_log_level()
+    try:
+        response = client.put(
+            "/admin/log-level", data={"level": "debug"}, headers={"X-Admin-Token": "secret"}
+        )
+        assert response.json()["level"] == "DEBUG"
+        assert logger_module.logger.isEnabledFor(logging.DEBUG)
+        response = client.put(
+            "/admin/log-level", data={"level": "loud"}, headers={"X-Admin-Token": "secret"}
+        )
+        assert response.status_code == 400
+    finally:
+        logger_module.set_log_level(previous)
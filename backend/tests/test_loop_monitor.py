@@ -0,0 +1,52 @@
+import asyncio
+import time
+import pytest
+from loop_monitor import LoopMonitor
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_monitor_names_the_blocking_function():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    assert len(monitor.blocks) == 1
+    module, function, seconds = monitor.blocks[0]
+    assert (module, function) == ("tests.test_loop_monitor", "blocking_handler")
+    assert seconds >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_monitor_ignores_short_callbacks():
+    monitor = LoopMonitor(interval=0.02, threshold=0.2)
+    monitor.start()
+    try:
+        for _ in range(5):
+            time.sleep(0.01)
+            await asyncio.sleep(0.01)
+    finally:
+        await monitor.stop()
+    assert not monitor.blocks
+
+
+@pytest.mark.asyncio
+async def test_monitor_keeps_only_recent_blocks():
+    monitor = LoopMonitor(interval=0.02, threshold=0.05, keep=2)
+    monitor.start()
+    try:
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            blocking_handler()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+    assert len(monitor.blocks) == 2
@@ -0,0 +1,55 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+import cache
+import metrics
+from main import app
+from rate_limit import RateLimit, send_with_retry
+
+
+def _sample(name, **labels):
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint_reports_route_templates():
+    client = TestClient(app)
+    before = _sample("http_request_duration_seconds_count", method="GET", route="/", status="200")
+    client.get("/")
+    after = _sample("http_request_duration_seconds_count", method="GET", route="/", status="200")
+    assert after == before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert "items_cache_hit_ratio" in response.text
+
+
+def test_cache_hit_ratio_comes_from_cache_stats(monkeypatch):
+    monkeypatch.setattr(
+        cache, "cache_stats",
+        {"local_hits": 3, "local_misses": 1, "redis_hits": 1, "redis_misses": 0},
+    )
+    assert _sample("items_cache_hit_ratio") == 1.0
+    assert _sample("items_cache_lookups_total", tier="local", result="hit") == 3
+
+
+@pytest.mark.asyncio
+async def test_upstream_calls_are_timed_per_endpoint():
+    labels = {"provider": "test", "endpoint": "/v1/things", "status": "200"}
+    before = _sample("upstream_request_duration_seconds_count", **labels)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    async with httpx.AsyncClient(transport=transport) as client:
+        await send_with_retry(
+            client, "GET", "https://example.test/v1/things",
+            provider="test", scope="s", limit=RateLimit(rate=100, burst=100),
+        )
+    assert _sample("upstream_request_duration_seconds_count", **labels) == before + 1
+
+
+def test_observe_load_records_payload_bytes():
+    before = _sample("load_payload_bytes_count", provider="test")
+    metrics.observe_load("test", 2048)
+    assert _sample("load_payload_bytes_count", provider="test") == before + 1
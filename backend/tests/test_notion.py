@@ -0,0 +1,188 @@
+import asyncio
+import httpx
+import pytest
+import http_client
+import offload
+from integrations import notion
+from serializer import loads
+
+
+def _row(object_id, edited, email="a@example.com"):
+    return {
+        "id": object_id,
+        "created_time": "2025-01-01T00:00:00.000Z",
+        "last_edited_time": edited,
+        "properties": {
+            "Name": {"title": [{"plain_text": f"Company {object_id}"}]},
+            "Email": {"email": email},
+            "Contact Number": {"phone_number": "+1 555 0100"},
+            "City/Country": {"rich_text": [{"plain_text": "Berlin"}]},
+        },
+    }
+
+
+@pytest.fixture
+def notion_upstream(monkeypatch):
+    # Workspace contents, newest first; honours page_size and start_cursor
+    rows = []
+
+    def handler(request):
+        body = loads(request.content) if request.content else {}
+        start = int(body.get("start_cursor") or 0)
+        page_size = body.get("page_size", 100)
+        chunk = rows[start : start + page_size]
+        has_more = start + page_size < len(rows)
+        return httpx.Response(
+            200,
+            json={"results": chunk, "has_more": has_more, "next_cursor": str(start + page_size) if has_more else None},
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setitem(http_client._clients, "notion", client)
+    return rows
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    store = {}
+
+    async def get_value(key):
+        return store.get(key)
+
+    async def add_value(key, value, expire=None):
+        store[key] = value
+
+    monkeypatch.setattr(notion, "get_value_redis", get_value)
+    monkeypatch.setattr(notion, "add_key_value_redis", add_value)
+    return store
+
+
+def test_merge_changes_marks_added_and_updated():
+    previous = [{"id": "1", "name": "One"}, {"id": "2", "name": "Two"}, {"id": "3", "name": "Three"}]
+    changed = {"2": {"id": "2", "name": "Two v2"}, "3": {"id": "3", "name": "Three"}, "4": {"id": "4", "name": "Four"}}
+    merged = notion.merge_changes(previous, changed, removed={"1"})
+    assert merged == [
+        {"id": "2", "name": "Two v2", "delta": "updated"},
+        {"id": "3", "name": "Three"},
+        {"id": "4", "name": "Four", "delta": "added"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_fetches_only_newer_objects(notion_upstream, fake_redis):
+    notion_upstream[:] = [_row("b", "2025-01-02T00:00:00.000Z"), _row("a", "2025-01-01T00:00:00.000Z")]
+    items = await notion.collect_items_notion("token")
+    assert [item["id"] for item in items] == ["b", "a"]
+    assert all("delta" not in item for item in items)
+
+    # 'c' is new, 'a' was edited, 'b' unchanged and older than the watermark
+    notion_upstream[:] = [
+        _row("c", "2025-01-03T00:00:00.000Z"),
+        _row("a", "2025-01-03T00:00:00.000Z", email="new@example.com"),
+        _row("b", "2025-01-02T00:00:00.000Z"),
+        _row("old", "2024-12-01T00:00:00.000Z"),
+    ]
+    changed, removed = await notion.fetch_changes_since("token", "2025-01-02T00:00:00.000Z")
+    assert set(changed) == {"c", "a", "b"} and removed == set()
+
+    items = await notion.collect_items_notion("token")
+    assert {item["id"]: item.get("delta") for item in items} == {"b": None, "a": "updated", "c": "added"}
+    state = loads(next(v for k, v in fake_redis.items() if k.startswith("notion_sync_state:")))
+    assert state["watermark"] == "2025-01-03T00:00:00.000Z"
+
+
+@pytest.mark.asyncio
+async def test_periodic_full_sync_drops_deleted_pages(notion_upstream, fake_redis, monkeypatch):
+    notion_upstream[:] = [_row("b", "2025-01-02T00:00:00.000Z"), _row("a", "2025-01-01T00:00:00.000Z")]
+    await notion.collect_items_notion("token")
+
+    # 'a' was deleted: search stops returning it, so a delta sync cannot notice
+    notion_upstream[:] = [_row("b", "2025-01-02T00:00:00.000Z")]
+    items = await notion.collect_items_notion("token")
+    assert {item["id"] for item in items} == {"a", "b"}
+
+    monkeypatch.setattr(notion, "FULL_SYNC_INTERVAL", 0)
+    items = await notion.collect_items_notion("token")
+    assert [item["id"] for item in items] == ["b"]
+    state = loads(next(v for k, v in fake_redis.items() if k.startswith("notion_sync_state:")))
+    assert [item["id"] for item in state["items"]] == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_iter_search_pages_follows_cursor_up_to_ceiling(notion_upstream, monkeypatch):
+    monkeypatch.setattr(notion, "SEARCH_PAGE_SIZE", 2)
+    notion_upstream[:] = [_row(str(i), "2025-01-01T00:00:00.000Z") for i in range(5)]
+
+    pages = [page async for page in notion.iter_search_pages("token")]
+    assert [[item["id"] for item in page] for page in pages] == [["0", "1"], ["2", "3"], ["4"]]
+
+    monkeypatch.setattr(notion, "MAX_SEARCH_PAGES", 2)
+    pages = [page async for page in notion.iter_search_pages("token")]
+    assert len(pages) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_pages_are_mapped_by_the_consumer_not_the_prefetcher(notion_upstream, monkeypatch):
+    monkeypatch.setattr(notion, "SEARCH_PAGE_SIZE", 1)
+    notion_upstream[:] = [_row(str(i), "2025-01-01T00:00:00.000Z") for i in range(3)]
+    build_items = notion.build_items
+    mapped_in = []
+
+    def recording_build_items(results):
+        mapped_in.append(asyncio.current_task())
+        return build_items(results)
+
+    monkeypatch.setattr(notion, "build_items", recording_build_items)
+    pages = [page async for page in notion.iter_search_pages("token")]
+    assert len(pages) == 3
+    assert mapped_in == [asyncio.current_task()] * 3
+
+
+@pytest.mark.asyncio
+async def test_large_search_pages_are_parsed_whole_in_the_pool(notion_upstream, monkeypatch):
+    monkeypatch.setattr(notion, "SEARCH_PAGE_SIZE", 2)
+    monkeypatch.setattr(offload, "OFFLOAD_EXECUTOR", "thread")
+    monkeypatch.setattr(offload, "OFFLOAD_THRESHOLD_BYTES", 1)
+    notion_upstream[:] = [_row(str(i), "2025-01-01T00:00:00.000Z") for i in range(3)]
+
+    async def decoded_on_loop(content):
+        raise AssertionError("large pages must not be decoded on the loop")
+
+    monkeypatch.setattr(notion, "_parse_search_results", decoded_on_loop)
+    offload.start_executor()
+    try:
+        pages = [page async for page in notion.iter_search_pages("token")]
+    finally:
+        offload.shutdown_executor()
+    assert [[item["id"] for item in page] for page in pages] == [["0", "1"], ["2"]]
+
+
+@pytest.mark.asyncio
+async def test_iter_search_pages_raises_upstream_errors(monkeypatch):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(401)))
+    monkeypatch.setitem(http_client._clients, "notion", client)
+    with pytest.raises(notion.HTTPException):
+        async for _ in notion.iter_search_pages("token"):
+            pass
+
+
+def test_plans_are_compiled_once_per_schema_and_follow_property_types():
+    row = _row("x", "2025-01-01T00:00:00.000Z")
+    for prop in row["properties"].values():
+        prop["type"] = next(iter(prop))
+    notion._plans.clear()
+    assert notion.build_items([row, row]) and len(notion._plans) == 1
+
+    # A database where the location is a select instead of rich text
+    select_row = _row("y", "2025-01-01T00:00:00.000Z")
+    select_row["properties"]["City/Country"] = {"type": "select", "select": {"name": "Paris"}}
+    [item] = notion.build_items([select_row])
+    assert item["location"] == "Paris" and len(notion._plans) == 2
+
+
+def test_rows_missing_required_fields_are_skipped_and_title_defaults():
+    untitled = _row("u", "2025-01-01T00:00:00.000Z")
+    untitled["properties"]["Name"]["title"] = []
+    no_email = _row("n", "2025-01-01T00:00:00.000Z", email=None)
+    items = notion.build_items([untitled, no_email])
+    assert [(item["id"], item["name"]) for item in items] == [("u", "Untitled")]
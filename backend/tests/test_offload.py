@@ -0,0 +1,32 @@
+import pytest
+import offload
+from integrations.hubspot import parse_contacts_page
+from serializer import dumps
+
+
+def _contacts_page(count):
+    return dumps({
+        "results": [{"id": str(i), "properties": {"firstname": f"C{i}"}} for i in range(count)],
+        "paging": {"next": {"after": "next-cursor"}},
+    })
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor", ["process", "thread"])
+async def test_large_payloads_run_in_pool_and_match_inline(monkeypatch, executor):
+    monkeypatch.setattr(offload, "OFFLOAD_EXECUTOR", executor)
+    monkeypatch.setattr(offload, "OFFLOAD_WORKERS", 1)
+    monkeypatch.setattr(offload, "OFFLOAD_THRESHOLD_BYTES", 1024)
+    payload = _contacts_page(200)
+    assert len(payload) > 1024
+
+    offload.start_executor()
+    try:
+        pooled = await offload.run_transform(parse_contacts_page, payload, 150)
+    finally:
+        offload.shutdown_executor()
+
+    inline = await offload.run_transform(parse_contacts_page, payload, 150)
+    assert pooled == inline
+    items, after = pooled
+    assert len(items) == 150 and after == "next-cursor"
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from pagination import paginate
+
+
+def _cursor_api(pages):
+    # pages[i] is served for cursor str(i); the last one has no next cursor
+    calls = []
+
+    async def fetch(cursor):
+        index = int(cursor or 0)
+        calls.append(index)
+        return f"{index}".encode()
+
+    async def parse(content):
+        index = int(content)
+        return pages[index], str(index + 1) if index + 1 < len(pages) else None
+
+    return fetch, parse, calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prefetch", [0, 2])
+async def test_paginate_follows_cursor_with_timings(prefetch):
+    fetch, parse, calls = _cursor_api([["a"], ["b"], ["c"]])
+    pages = [page async for page in paginate(fetch, parse, provider="Test", prefetch=prefetch)]
+    assert [page.data for page in pages] == [["a"], ["b"], ["c"]]
+    assert [page.number for page in pages] == [1, 2, 3]
+    assert all(page.fetch_seconds >= 0 and page.parse_seconds >= 0 for page in pages)
+    assert calls == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_paginate_stops_at_max_pages():
+    fetch, parse, calls = _cursor_api([["a"]] * 10)
+    pages = [page async for page in paginate(fetch, parse, provider="Test", max_pages=3)]
+    assert len(pages) == 3
+    assert calls == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_paginate_prefetches_while_consumer_works():
+    fetch, parse, calls = _cursor_api([["a"], ["b"], ["c"]])
+    pages = paginate(fetch, parse, provider="Test", prefetch=2)
+    first = await pages.__anext__()
+    await asyncio.sleep(0.01)
+    # The producer ran ahead while the first page was being handled
+    assert first.number == 1 and len(calls) == 3
+    await pages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_paginate_reraises_upstream_errors_after_earlier_pages():
+    async def fetch(cursor):
+        if cursor:
+            raise RuntimeError("upstream down")
+        return b"0"
+
+    async def parse(content):
+        return ["a"], "next"
+
+    seen = []
+    with pytest.raises(RuntimeError):
+        async for page in paginate(fetch, parse, provider="Test", prefetch=1):
+            seen.append(page.data)
+    assert seen == [["a"]]
@@ -0,0 +1,81 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+import admin
+import profiler
+from main import app
+
+
+def busy_handler(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "_request_profiles", profiler.OrderedDict())
+
+
+@pytest.mark.asyncio
+async def test_profile_for_returns_collapsed_stacks(enabled):
+    async def work():
+        await asyncio.sleep(0.02)
+        busy_handler(0.2)
+
+    task = asyncio.create_task(work())
+    collapsed = await profiler.profile_for(0.3)
+    await task
+
+    # "outer;...;inner count", split on the last space
+    stacks = dict(line.rsplit(" ", 1) for line in collapsed.splitlines())
+    assert all(int(count) > 0 for count in stacks.values())
+    assert any(stack.endswith("test_profiler.py:busy_handler") for stack in stacks)
+
+
+@pytest.mark.asyncio
+async def test_profile_for_is_disabled_by_default_and_single_flight(enabled, monkeypatch):
+    first = asyncio.create_task(profiler.profile_for(0.1))
+    await asyncio.sleep(0.01)
+    with pytest.raises(profiler.HTTPException) as exc:
+        await profiler.profile_for(0.1)
+    assert exc.value.status_code == 409
+    await first
+
+    monkeypatch.setattr(profiler, "PROFILING_ENABLED", False)
+    with pytest.raises(profiler.HTTPException) as exc:
+        await profiler.profile_for(0.1)
+    assert exc.value.status_code == 404
+
+
+def test_profile_route_requires_admin(enabled):
+    client = TestClient(app)
+    assert client.post("/admin/profile", data={"seconds": "0.05"}).status_code == 403
+
+    response = client.post("/admin/profile", data={"seconds": "0.05"}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_request_profiling_middleware(enabled):
+    async def slow(request):
+        busy_handler(0.1)
+        return PlainTextResponse("done")
+
+    inner = Starlette(routes=[Route("/slow", slow)])
+    client = TestClient(profiler.ProfileRequestMiddleware(inner))
+
+    plain = client.get("/slow", headers={"X-Profile": "1"})
+    assert plain.text == "done"
+    assert "x-profile-id" not in plain.headers
+
+    response = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert response.text == "done"
+    collapsed = profiler.get_request_profile(response.headers["x-profile-id"])
+    assert "test_profiler.py:busy_handler" in collapsed
@@ -0,0 +1,83 @@
+import time
+import httpx
+import pytest
+import rate_limit
+from rate_limit import RateLimit, acquire, parse_retry_after, send_with_retry
+
+UNLIMITED = RateLimit(rate=1000, burst=1000)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_once_burst_is_spent():
+    limit = RateLimit(rate=20, burst=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await acquire("test", "scope", limit)
+    # Two tokens up front, then two more at 20/s
+    assert time.monotonic() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_send_with_retry_honours_retry_after(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"})
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await send_with_retry(
+            client, "GET", "https://example.test", provider="test", scope="s", limit=UNLIMITED
+        )
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert sleeps[0] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_send_with_retry_returns_last_response_when_exhausted():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await send_with_retry(
+            client, "GET", "https://example.test", provider="test", scope="s", limit=UNLIMITED
+        )
+    assert response.status_code == 500
+    assert len(calls) == rate_limit.RETRY_MAX_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_send_with_retry_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(401)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response = await send_with_retry(
+            client, "GET", "https://example.test", provider="test", scope="s", limit=UNLIMITED
+        )
+    assert response.status_code == 401
+    assert len(calls) == 1
@@ -1,6 +1,10 @@
 import pytest
 import asyncio
-from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+import redis_client
+from redis_client import (
+    add_key_value_redis, get_value_redis, delete_key_redis,
+    mget_redis, mpop_redis, mset_redis, pop_value_redis
+)
 
 @pytest.mark.asyncio
 async def test_redis_set_get_delete():
@@ -11,3 +15,27 @@ async def test_redis_set_get_delete():
     await delete_key_redis("testkey")
     value = await get_value_redis("testkey")
     assert value is None
+
+def test_large_values_are_compressed_and_round_trip(monkeypatch):
+    monkeypatch.setattr(redis_client, "REDIS_COMPRESSION", "zlib")
+    value = b'[{"id":"1","name":"Contact"}]' * 200
+    encoded = redis_client._encode_value(value)
+    assert encoded[:1] == redis_client._ZLIB_MARKER
+    assert len(encoded) < len(value)
+    assert redis_client._decode_value(encoded) == value
+    assert redis_client.get_compression_stats()["ratio"] > 1
+
+def test_small_and_legacy_values_read_unchanged():
+    assert redis_client._encode_value("testvalue") == b"testvalue"
+    assert redis_client._decode_value(b'[{"id":"1"}]') == b'[{"id":"1"}]'
+    escaped = redis_client._encode_value(b"\x01abc")
+    assert redis_client._decode_value(escaped) == b"\x01abc"
+
+@pytest.mark.asyncio
+async def test_redis_batch_set_get_pop():
+    await mset_redis({"testkey1": "one", "testkey2": "two"}, expire=5)
+    assert await mget_redis("testkey1", "testkey2", "testkey3") == [b"one", b"two", None]
+
+    assert await pop_value_redis("testkey1") == b"one"
+    assert await mpop_redis("testkey1", "testkey2") == [None, b"two"]
+    assert await get_value_redis("testkey2") is None
@@ -0,0 +1,22 @@
+from datetime import datetime
+import serializer
+from serializer import FastJSONResponse, RawJSONResponse, dumps, loads
+
+
+def test_round_trip_returns_compact_bytes():
+    encoded = dumps([{"id": "1", "name": "Ünïcode"}])
+    assert isinstance(encoded, bytes)
+    assert b" " not in encoded.replace("Ünïcode".encode(), b"")
+    assert loads(encoded) == [{"id": "1", "name": "Ünïcode"}]
+
+
+def test_stdlib_fallback_encodes_datetimes():
+    assert serializer._default(datetime(2025, 1, 2, 3, 4, 5)) == "2025-01-02T03:04:05"
+
+
+def test_raw_response_passes_bytes_through():
+    body = b'[{"id":"1"}]'
+    response = RawJSONResponse(body)
+    assert response.body is body
+    assert response.media_type == "application/json"
+    assert FastJSONResponse([{"id": "1"}]).body == body
@@ -0,0 +1,56 @@
+import json
+import pytest
+import streaming
+
+
+async def _pages(*pages):
+    for page in pages:
+        yield page
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    store = {}
+
+    async def get_items_entry(key, expire=300, soft_ttl=None):
+        return store.get(key), False
+
+    async def store_items(key, value, expire=None, soft_ttl=None):
+        store[key] = value
+
+    monkeypatch.setattr(streaming, "get_items_entry", get_items_entry)
+    monkeypatch.setattr(streaming, "store_items", store_items)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_stream_cached_pages_caches_then_hits(fake_redis):
+    pages = [p async for p in streaming.stream_cached_pages("k", _pages([{"id": 1}], [{"id": 2}]))]
+    assert pages == [[{"id": 1}], [{"id": 2}]]
+    assert json.loads(fake_redis["k"]) == [{"id": 1}, {"id": 2}]
+
+    pages = [p async for p in streaming.stream_cached_pages("k", _pages([{"id": 3}]))]
+    assert pages == [[{"id": 1}, {"id": 2}]]
+
+
+@pytest.mark.asyncio
+async def test_stream_cached_pages_skips_cache_for_large_streams(fake_redis, monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CACHE_MAX_ITEMS", 1)
+    pages = [p async for p in streaming.stream_cached_pages("k", _pages([{"id": 1}], [{"id": 2}]))]
+    assert len(pages) == 2
+    assert "k" not in fake_redis
+
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_end_with_summary_or_error():
+    lines = b"".join([c async for c in streaming._ndjson_lines(_pages([{"id": 1}, {"id": 2}]), "notion")])
+    records = [json.loads(line) for line in lines.splitlines()]
+    assert records[:2] == [{"id": 1}, {"id": 2}]
+    assert records[-1] == {"summary": {"provider": "notion", "items": 2, "pages": 1}}
+
+    async def failing():
+        yield [{"id": 1}]
+        raise RuntimeError("upstream down")
+
+    lines = b"".join([c async for c in streaming._ndjson_lines(failing(), "notion")])
+    assert json.loads(lines.splitlines()[-1])["error"] == "notion data fetch failed."
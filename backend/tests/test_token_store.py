@@ -0,0 +1,142 @@
+import asyncio
+import time
+import pytest
+import token_store
+from fastapi import HTTPException
+from serializer import dumps, loads
+
+
+@pytest.fixture
+def store(monkeypatch):
+    data = {}
+
+    async def get_value(key):
+        return data.get(key)
+
+    async def mset(mapping, expire=None):
+        data.update(mapping)
+
+    async def acquire_lock(key, ttl_ms):
+        return "lock"
+
+    async def release_lock(key, token):
+        pass
+
+    monkeypatch.setattr(token_store, "get_value_redis", get_value)
+    monkeypatch.setattr(token_store, "mset_redis", mset)
+    monkeypatch.setattr(token_store, "acquire_lock_redis", acquire_lock)
+    monkeypatch.setattr(token_store, "release_lock_redis", release_lock)
+    monkeypatch.setattr(token_store, "_hot", token_store.OrderedDict())
+    monkeypatch.setattr(token_store, "_owners", token_store.OrderedDict())
+    monkeypatch.setattr(token_store, "_parsed", token_store.OrderedDict())
+    monkeypatch.setattr(token_store, "_refreshers", {})
+    return data
+
+
+def _refresher(calls):
+    async def refresh(refresh_token):
+        calls.append(refresh_token)
+        await asyncio.sleep(0.01)
+        return dumps({"access_token": f"access{len(calls)}", "expires_in": 3600})
+    return refresh
+
+
+def test_as_token_parses_credentials_once(store):
+    token = token_store.as_token('{"access_token": "abc"}')
+    assert token.access_token == "abc"
+    assert token_store.as_token('{"access_token": "abc"}') is token
+    assert token_store.as_token(token) is token
+
+
+@pytest.mark.asyncio
+async def test_saved_token_is_served_from_memory(store):
+    token_store.register_refresher("svc", _refresher([]))
+    await token_store.save_token("svc", "org", "user", b'{"access_token": "abc", "refresh_token": "r", "expires_in": 3600}')
+    store.clear()
+    token = await token_store.get_token("svc", "org", "user")
+    assert token.access_token == "abc"
+
+
+@pytest.mark.asyncio
+async def test_tokens_without_a_refresher_are_not_stored(store):
+    token = await token_store.save_token("svc", "org", "user", b'{"access_token": "abc", "refresh_token": "r"}')
+    assert token.access_token == "abc"
+    assert store == {}
+    assert (await token_store.current_token("svc", '{"access_token": "abc"}')).access_token == "abc"
+
+
+@pytest.mark.asyncio
+async def test_loads_posting_the_original_token_get_the_refreshed_one(store):
+    calls = []
+    token_store.register_refresher("svc", _refresher(calls))
+    original = b'{"access_token": "old", "refresh_token": "r1", "expires_in": 3600}'
+    await token_store.save_token("svc", "org", "user", original)
+    # Another worker: nothing in memory, and the stored token has since expired
+    token_store._hot.clear()
+    token_store._owners.clear()
+    store["svc_token:org:user"] = dumps(
+        {"access_token": "old", "refresh_token": "r1", "expires_at": time.time() - 1}
+    )
+
+    token = await token_store.current_token("svc", original.decode())
+    assert token.access_token == "access1"
+    assert calls == ["r1"]
+
+    unknown = await token_store.current_token("svc", '{"access_token": "someone-else"}')
+    assert unknown.access_token == "someone-else"
+
+
+@pytest.mark.asyncio
+async def test_missing_token_raises(store):
+    with pytest.raises(HTTPException):
+        await token_store.get_token("svc", "org", "nobody")
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_refreshed_once_for_concurrent_loads(store):
+    calls = []
+    token_store.register_refresher("svc", _refresher(calls))
+    store["svc_token:org:user"] = dumps(
+        {"access_token": "old", "refresh_token": "r1", "expires_at": time.time() - 1}
+    )
+
+    tokens = await asyncio.gather(*[token_store.get_token("svc", "org", "user") for _ in range(5)])
+    assert calls == ["r1"]
+    assert {token.access_token for token in tokens} == {"access1"}
+    # The refresh response omitted refresh_token, so the old one is kept
+    assert loads(store["svc_token:org:user"])["refresh_token"] == "r1"
+
+
+@pytest.mark.asyncio
+async def test_token_near_expiry_is_refreshed_in_background(store):
+    calls = []
+    token_store.register_refresher("svc", _refresher(calls))
+    store["svc_token:org:user"] = dumps(
+        {"access_token": "old", "refresh_token": "r1", "expires_at": time.time() + 60}
+    )
+
+    token = await token_store.get_token("svc", "org", "user")
+    assert token.access_token == "old"
+    await asyncio.gather(*token_store._background)
+    assert calls == ["r1"]
+    assert (await token_store.get_token("svc", "org", "user")).access_token == "access1"
+
+
+@pytest.mark.asyncio
+async def test_refresh_adopts_token_another_worker_stored(store):
+    calls = []
+    token_store.register_refresher("svc", _refresher(calls))
+    store["svc_token:org:user"] = dumps(
+        {"access_token": "old", "refresh_token": "r1", "expires_at": time.time() - 1}
+    )
+    await token_store.get_token("svc", "org", "user")
+    calls.clear()
+
+    # This worker's hot token expires, but another worker already refreshed it
+    token_store._hot[("svc", "org", "user")].expires_at = time.time() - 1
+    store["svc_token:org:user"] = dumps(
+        {"access_token": "theirs", "refresh_token": "r2", "expires_at": time.time() + 3600}
+    )
+    token = await token_store.get_token("svc", "org", "user")
+    assert token.access_token == "theirs"
+    assert calls == []
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+import warmup
+
+
+# Each test runs on its own event loop, so start from fresh warm-up state
+@pytest.fixture(autouse=True)
+def reset_warmups(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(warmup, "_semaphore", None)
+    monkeypatch.setattr(warmup, "_tasks", {})
+
+
+@pytest.mark.asyncio
+async def test_warmups_run_with_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_MAX_CONCURRENCY", 2)
+    running = 0
+    peak = 0
+    done = []
+
+    def make_load(n):
+        async def load():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            done.append(n)
+        return load
+
+    for n in range(5):
+        assert warmup.schedule_warmup("Test", f"user{n}", make_load(n))
+    while warmup._tasks:
+        await asyncio.sleep(0.01)
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicate_and_overflow_warmups_are_skipped(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(warmup, "WARMUP_MAX_PENDING", 1)
+    gate = asyncio.Event()
+
+    async def load():
+        await gate.wait()
+
+    assert warmup.schedule_warmup("Test", "a", load)
+    assert not warmup.schedule_warmup("Test", "a", load)
+    assert warmup.schedule_warmup("Test", "b", load)
+    assert not warmup.schedule_warmup("Test", "c", load)
+    gate.set()
+    await warmup.stop_warmups()
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_is_swallowed():
+    async def load():
+        raise RuntimeError("upstream down")
+
+    assert warmup.schedule_warmup("Test", "a", load)
+    await asyncio.gather(*warmup._tasks.values())
+    await asyncio.sleep(0)
+    assert not warmup._tasks
+
+
+def test_disabled_warmup_does_nothing(monkeypatch):
+    monkeypatch.setattr(warmup, "WARMUP_ENABLED", False)
+    assert not warmup.schedule_warmup("Test", "a", lambda: None)
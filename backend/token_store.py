@@ -0,0 +1,226 @@
+# backend/token_store.py
+
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from fastapi import HTTPException
+from redis_client import (
+    acquire_lock_redis,
+    get_value_redis,
+    mset_redis,
+    release_lock_redis,
+)
+from cache import single_flight
+from serializer import dumps, loads
+from logger import logger
+
+# Refresh tokens this many seconds before they expire; until then loads keep using the
+# current token while the refresh runs in the background
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TOKEN_REFRESH_MARGIN", 300))
+# How long a refreshable token set is kept in Redis without being refreshed
+TOKEN_STORE_TTL = int(os.environ.get("TOKEN_STORE_TTL", 30 * 24 * 3600))
+# Cross-worker refresh lock; other workers wait this long for the new token
+TOKEN_REFRESH_LOCK_TTL = 30
+TOKEN_REFRESH_POLL_INTERVAL = 0.2
+# Entries in the in-process token maps
+HOT_TOKENS_MAX = int(os.environ.get("HOT_TOKENS_MAX", 10000))
+
+
+class Token:
+    __slots__ = ("access_token", "refresh_token", "expires_at", "token_hash")
+
+    def __init__(self, access_token, refresh_token=None, expires_at=None):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        # Hashed once here rather than on every load; used in per-token cache keys
+        self.token_hash = hashlib.sha256(access_token.encode()).hexdigest()
+
+    def expires_in(self):
+        return None if self.expires_at is None else self.expires_at - time.time()
+
+
+# provider -> async fn(refresh_token) returning the token endpoint's response body
+_refreshers = {}
+# (provider, org_id, user_id) -> Token
+_hot: OrderedDict = OrderedDict()
+# (provider, token_hash) -> (org_id, user_id), or None for tokens the store didn't issue
+_owners: OrderedDict = OrderedDict()
+# raw credentials JSON -> Token, so repeat loads skip parsing and hashing
+_parsed: OrderedDict = OrderedDict()
+# Background refreshes, referenced until they finish
+_background: set[asyncio.Task] = set()
+
+
+def register_refresher(provider, refresh):
+    _refreshers[provider] = refresh
+
+
+def _remember(cache: OrderedDict, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > HOT_TOKENS_MAX:
+        cache.popitem(last=False)
+
+
+def _redis_key(provider, org_id, user_id):
+    return f"{provider}_token:{org_id}:{user_id}"
+
+
+def _owner_key(provider, token_hash):
+    return f"{provider}_token_owner:{token_hash}"
+
+
+def _from_payload(payload: dict) -> Token:
+    return Token(
+        payload["access_token"],
+        refresh_token=payload.get("refresh_token"),
+        expires_at=payload.get("expires_at"),
+    )
+
+
+# Token for a credentials JSON string as posted to /load (or a Token already resolved)
+def as_token(credentials) -> Token:
+    if isinstance(credentials, Token):
+        return credentials
+    token = _parsed.get(credentials)
+    if token is None:
+        token = Token(loads(credentials)["access_token"])
+        _remember(_parsed, credentials, token)
+    return token
+
+
+# Persist a token endpoint response for org/user and make it the hot token. Only
+# tokens the store can refresh are kept; others are returned without being written.
+async def save_token(provider, org_id, user_id, token_response) -> Token:
+    payload = loads(token_response)
+    if payload.get("expires_in"):
+        payload["expires_at"] = time.time() + float(payload["expires_in"])
+    token = _from_payload(payload)
+    if provider not in _refreshers or not token.refresh_token:
+        return token
+
+    # The owner record lets loads that post this token find the connection again
+    await mset_redis(
+        {
+            _redis_key(provider, org_id, user_id): dumps(payload),
+            _owner_key(provider, token.token_hash): dumps([org_id, user_id]),
+        },
+        expire=TOKEN_STORE_TTL,
+    )
+    _remember(_hot, (provider, org_id, user_id), token)
+    _remember(_owners, (provider, token.token_hash), (org_id, user_id))
+    logger.debug("[TokenStore] Saved %s token for user='%s'", provider, user_id)
+    return token
+
+
+async def _load_stored(provider, org_id, user_id):
+    stored = await get_value_redis(_redis_key(provider, org_id, user_id))
+    return _from_payload(loads(stored)) if stored else None
+
+
+def _is_newer(token, than):
+    return token is not None and (token.expires_at or 0) > (than.expires_at or 0)
+
+
+async def _refresh(provider, org_id, user_id, current: Token) -> Token:
+    redis_key = _redis_key(provider, org_id, user_id)
+    lock_key = f"{redis_key}:refresh_lock"
+    lock_token = await acquire_lock_redis(lock_key, TOKEN_REFRESH_LOCK_TTL * 1000)
+    try:
+        if lock_token is None:
+            # Another worker is refreshing; refresh tokens may be single-use, so wait for it
+            deadline = time.monotonic() + TOKEN_REFRESH_LOCK_TTL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(TOKEN_REFRESH_POLL_INTERVAL)
+                latest = await _load_stored(provider, org_id, user_id)
+                if _is_newer(latest, current):
+                    _remember(_hot, (provider, org_id, user_id), latest)
+                    return latest
+                if not await get_value_redis(lock_key):
+                    break
+        else:
+            # It may have been refreshed since this worker last read it
+            latest = await _load_stored(provider, org_id, user_id)
+            if _is_newer(latest, current):
+                _remember(_hot, (provider, org_id, user_id), latest)
+                return latest
+            if latest is not None:
+                current = latest
+
+        logger.info(f"[TokenStore] Refreshing {provider} token for user='{user_id}'")
+        payload = loads(await _refreshers[provider](current.refresh_token))
+        # Providers that don't rotate refresh tokens may omit it from the response
+        payload.setdefault("refresh_token", current.refresh_token)
+        return await save_token(provider, org_id, user_id, dumps(payload))
+    finally:
+        if lock_token is not None:
+            await release_lock_redis(lock_key, lock_token)
+
+
+def _refresh_in_background(flight_key, refresh):
+    def done(task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning("[TokenStore] Background token refresh failed", exc_info=task.exception())
+
+    task = asyncio.ensure_future(single_flight(flight_key, refresh))
+    _background.add(task)
+    task.add_done_callback(done)
+
+
+# Current token for org/user, from the in-process map or Redis. Tokens close to expiry
+# are refreshed in the background; expired ones are refreshed before returning.
+# Refreshes are deduplicated in-process and across workers. org/user must come from an
+# authenticated identity, never straight from request fields.
+async def get_token(provider, org_id, user_id) -> Token:
+    hot_key = (provider, org_id, user_id)
+    token = _hot.get(hot_key)
+    if token is None:
+        token = await _load_stored(provider, org_id, user_id)
+        if token is None:
+            logger.warning(f"[TokenStore] No {provider} token stored for user='{user_id}'")
+            raise HTTPException(status_code=400, detail="No credentials found.")
+        _remember(_hot, hot_key, token)
+
+    remaining = token.expires_in()
+    if remaining is None or remaining > TOKEN_REFRESH_MARGIN:
+        return token
+    if not token.refresh_token or provider not in _refreshers:
+        return token
+
+    flight_key = f"token_refresh:{provider}:{org_id}:{user_id}"
+    refresh = lambda: _refresh(provider, org_id, user_id, token)
+    if remaining > 0:
+        _refresh_in_background(flight_key, refresh)
+        return token
+    return await single_flight(flight_key, refresh)
+
+
+
+# Token to call the provider with for posted credentials. A token the OAuth callback
+# stored maps back to its connection, so long sessions get the refreshed token instead
+# of an expired original; any other token is used as posted.
+async def current_token(provider, credentials) -> Token:
+    posted = as_token(credentials)
+    if provider not in _refreshers:
+        return posted
+
+    owner_key = (provider, posted.token_hash)
+    if owner_key in _owners:
+        owner = _owners[owner_key]
+    else:
+        stored = await get_value_redis(_owner_key(provider, posted.token_hash))
+        owner = tuple(loads(stored)) if stored else None
+        _remember(_owners, owner_key, owner)
+    if owner is None:
+        return posted
+
+    org_id, user_id = owner
+    try:
+        return await get_token(provider, org_id, user_id)
+    except Exception:
+        logger.warning(f"[TokenStore] Using posted {provider} token, stored one unavailable", exc_info=True)
+        return posted
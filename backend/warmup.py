@@ -0,0 +1,60 @@
+# backend/warmup.py
+
+import os
+import asyncio
+from logger import logger
+
+# Start fetching a user's items in the background as soon as their OAuth callback
+# succeeds, so the first /load is usually a cache hit
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+# Warm-ups crawling upstream at once, and how many more may wait for a slot; a login
+# burst beyond that is dropped rather than queued
+WARMUP_MAX_CONCURRENCY = int(os.environ.get("WARMUP_MAX_CONCURRENCY", 4))
+WARMUP_MAX_PENDING = int(os.environ.get("WARMUP_MAX_PENDING", 64))
+
+_semaphore: asyncio.Semaphore | None = None
+# key -> running task; also keeps tasks referenced until they finish
+_tasks: dict[str, asyncio.Task] = {}
+
+
+async def _run(provider, key, load):
+    async with _semaphore:
+        try:
+            await load()
+            logger.info(f"[{provider}] Item cache warmed")
+        except Exception:
+            # The first /load will simply fetch on its own
+            logger.warning(f"[{provider}] Cache warm-up failed", exc_info=True)
+
+
+# Schedule load() (a coroutine function that populates the item cache) unless
+# warm-ups are disabled, one is already running for key, or the backlog is full.
+# Returns whether a warm-up was scheduled.
+def schedule_warmup(provider, key, load) -> bool:
+    global _semaphore
+    if not WARMUP_ENABLED:
+        return False
+    if key in _tasks:
+        return False
+    if len(_tasks) >= WARMUP_MAX_CONCURRENCY + WARMUP_MAX_PENDING:
+        logger.warning(f"[{provider}] Warm-up backlog full, skipping")
+        return False
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(WARMUP_MAX_CONCURRENCY)
+
+    task = asyncio.create_task(_run(provider, key, load))
+    _tasks[key] = task
+    task.add_done_callback(lambda _: _tasks.pop(key, None))
+    logger.debug("[%s] Scheduled cache warm-up", provider)
+    return True
+
+
+# Cancel outstanding warm-ups (called on app shutdown)
+async def stop_warmups():
+    global _semaphore
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _tasks.clear()
+    _semaphore = None